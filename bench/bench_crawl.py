@@ -0,0 +1,177 @@
+"""
+End-to-end crawl benchmark against the local fixture server.
+
+Usage (from the repository root):
+    python -m bench.bench_crawl [--engine threads|async] [--listings N]
+        [--latency MS] [--jitter MS] [--error-rate R] [--sharded]
+        [--adaptive] [--catalogue CSV] [--json FILE]
+
+Starts bench/fixture_server.py in a child process, collects every link with
+LinkCollector and scrapes them with the chosen engine, then reports per
+phase: pages/sec, CPU utilisation (100% = one core busy) and, for the
+detail phase, parse ms/page, plus the process's peak memory (max RSS).
+With --json the results are appended as one JSON line, so runs can be
+compared over time to catch regressions.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+from bench import fixture_server
+from lib.detail_scraper import DetailScraper
+from lib.link_collector import LinkCollector
+from lib.rate_limiter import AdaptiveLimiter
+
+
+class Phase:
+    """Wall time and CPU time of one benchmark phase."""
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = self._cpu()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = self._cpu() - self.cpu
+        return False
+
+    @staticmethod
+    def _cpu():
+        t = os.times()
+        return t.user + t.system
+
+    def report(self, pages):
+        return {
+            "pages": pages,
+            "seconds": round(self.wall, 3),
+            "pages_per_sec": round(pages / self.wall, 1) if self.wall else None,
+            "cpu_percent": round(100 * self.cpu / self.wall, 1) if self.wall else None,
+        }
+
+
+class CountingCollector(LinkCollector):
+    """LinkCollector that counts the result pages it requests."""
+
+    def __init__(self, base_url, limiter=None):
+        super().__init__(limiter=limiter)
+        self.BASE_URL = base_url
+        self.requests = 0
+
+    def _get(self, session, url):
+        self.requests += 1
+        return super()._get(session, url)
+
+
+def timed_parse(parse, timings):
+    """Wrap a scraper's parse method to record the time of every call."""
+    def parse_and_time(body, link, encoding=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return parse(body, link, encoding, **kwargs)
+        finally:
+            timings.append((time.perf_counter() - start) * 1000)
+    return parse_and_time
+
+
+def make_scraper(engine, limiter):
+    if engine == "async":
+        from lib.async_scraper import AsyncDetailScraper
+        return AsyncDetailScraper(concurrency=200, http2=False, limiter=limiter)
+    return DetailScraper(max_workers=12, limiter=limiter)
+
+
+def run(engine="threads", listings=None, latency=0.0, jitter=0.0, error_rate=0.0,
+        sharded=False, adaptive=False, catalogue=fixture_server.CATALOGUE_FILE):
+    server, port, served = fixture_server.start(
+        catalogue_file=catalogue, limit=listings,
+        latency=latency, jitter=jitter, error_rate=error_rate,
+    )
+    base_url = LinkCollector.BASE_URL.replace("https://immovlan.be", f"http://127.0.0.1:{port}")
+    try:
+        limiter = AdaptiveLimiter() if adaptive else None
+        collector = CountingCollector(base_url, limiter=limiter)
+        with Phase() as collect:
+            if sharded:
+                links = collector.fetch_all_links_sharded()
+            else:
+                links = collector.fetch_all_links_dynamic()
+
+        scraper = make_scraper(engine, limiter)
+        parse_ms = []
+        scraper.parse = timed_parse(scraper.parse, parse_ms)
+        with tempfile.TemporaryDirectory() as tmp, Phase() as scrape:
+            scraper.scrape_and_store(links, os.path.join(tmp, "details.csv"))
+    finally:
+        server.terminate()
+
+    return {
+        "engine": engine,
+        "sharded": sharded,
+        "adaptive": adaptive,
+        "listings": served,
+        "latency_ms": latency * 1000,
+        "error_rate": error_rate,
+        "links": len(links),
+        "collect": collect.report(collector.requests),
+        "scrape": dict(
+            scrape.report(len(links)),
+            parse_ms_mean=round(statistics.mean(parse_ms), 3) if parse_ms else None,
+            parse_ms_median=round(statistics.median(parse_ms), 3) if parse_ms else None,
+            failed=len(scraper.dead_letters),
+        ),
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def print_report(result):
+    print(f"\n{result['listings']} listings served, {result['links']} links collected "
+          f"({result['engine']} engine, latency {result['latency_ms']:.0f} ms, "
+          f"error rate {result['error_rate']:.1%})\n")
+    print(f"{'phase':<9} {'pages':>7} {'seconds':>9} {'pages/s':>9} {'CPU %':>7}")
+    for phase in ("collect", "scrape"):
+        r = result[phase]
+        print(f"{phase:<9} {r['pages']:>7} {r['seconds']:>9.2f} "
+              f"{r['pages_per_sec']:>9.1f} {r['cpu_percent']:>7.1f}")
+    scrape = result["scrape"]
+    if scrape["parse_ms_mean"] is not None:
+        print(f"\nparse ms/page: mean {scrape['parse_ms_mean']:.2f}, "
+              f"median {scrape['parse_ms_median']:.2f}")
+    print(f"failed detail pages: {scrape['failed']}")
+    print(f"peak memory (max RSS): {result['max_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads")
+    parser.add_argument("--listings", type=int, default=None,
+                        help="serve only the N cheapest listings of the catalogue")
+    parser.add_argument("--latency", type=float, default=20, help="response delay in ms")
+    parser.add_argument("--jitter", type=float, default=10, help="extra random delay in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests answered with 503/429")
+    parser.add_argument("--sharded", action="store_true")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--catalogue", default=fixture_server.CATALOGUE_FILE)
+    parser.add_argument("--json", help="append the results as a JSON line to this file")
+    args = parser.parse_args()
+
+    result = run(
+        engine=args.engine, listings=args.listings,
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, sharded=args.sharded, adaptive=args.adaptive,
+        catalogue=args.catalogue,
+    )
+    print_report(result)
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare per-page parse time of the detail extractors on saved pages.
+
+Usage (from the repository root):
+    python -m bench.bench_extractors [pages_dir] [repeats]
+
+Every *.html file in pages_dir (default bench/pages) is parsed 'repeats'
+times with each extractor. Records from the extractors are also compared, so
+a page where they disagree is reported before it reaches a crawl.
+"""
+import glob
+import os
+import statistics
+import sys
+import time
+
+from lib.detail_scraper import DetailScraper
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+REPEATS = 50
+
+
+def load_pages(pages_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def time_extractor(parse, pages, repeats):
+    """Return the per-page parse times in milliseconds."""
+    timings = []
+    for name, body in pages:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            parse(body, name, "utf-8")
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(pages_dir=PAGES_DIR, repeats=REPEATS):
+    pages = load_pages(pages_dir)
+    if not pages:
+        print(f"No .html pages found in {pages_dir}")
+        return
+
+    print(f"{len(pages)} page(s), {repeats} repeats each\n")
+    print(f"{'extractor':<10} {'mean ms':>9} {'median ms':>10} {'p95 ms':>8}")
+
+    results = {}
+    for extractor, method in DetailScraper.EXTRACTORS.items():
+        parse = getattr(DetailScraper, method)
+        timings = sorted(time_extractor(parse, pages, repeats))
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        results[extractor] = statistics.mean(timings)
+        print(f"{extractor:<10} {results[extractor]:>9.2f} "
+              f"{statistics.median(timings):>10.2f} {p95:>8.2f}")
+
+    baseline = results["bs4"]
+    for extractor, mean in results.items():
+        if extractor != "bs4":
+            print(f"\n{extractor} speedup over bs4: {baseline / mean:.1f}x")
+
+    mismatches = 0
+    for name, body in pages:
+        records = {
+            extractor: getattr(DetailScraper, method)(body, name, "utf-8")
+            for extractor, method in DetailScraper.EXTRACTORS.items()
+        }
+        reference = records.pop("bs4")
+        for extractor, record in records.items():
+            if record != reference:
+                mismatches += 1
+                diff = {k: (reference[k], record[k]) for k in reference if reference[k] != record[k]}
+                print(f"Mismatch on {name} ({extractor} vs bs4): {diff}")
+    if not mismatches:
+        print("All extractors produced identical records.")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        pages_dir=args[0] if args else PAGES_DIR,
+        repeats=int(args[1]) if len(args) > 1 else REPEATS,
+    )
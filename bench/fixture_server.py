@@ -0,0 +1,157 @@
+"""
+Local HTTP server that stands in for immovlan.be during benchmarks.
+
+Search-result pages are generated from a catalogue of (link, price) rows,
+e.g. a previous crawl's property_details.csv, with the same markup, price
+filters, ascending price order and "next" link the collector relies on, so
+minprice/maxprice windows and pagination behave like the real site. Detail
+pages replay the saved *.html files in bench/pages; each listing always gets
+the same file.
+
+Every response can be delayed ('latency' seconds, plus up to 'jitter') and a
+share of requests ('error_rate') fails with a 503 or a 429 with Retry-After.
+Bodies are gzipped for clients that accept it, like the real site does.
+"""
+import bisect
+import gzip
+import multiprocessing
+import os
+import random
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(__file__)
+PAGES_DIR = os.path.join(BENCH_DIR, "pages")
+CATALOGUE_FILE = os.path.join(BENCH_DIR, "..", "src", "property_details.csv")
+CARDS_PER_PAGE = 20
+
+
+def load_catalogue(path=CATALOGUE_FILE, limit=None):
+    """
+    Return (prices, paths) sorted by price from a CSV with a Link column and,
+    ideally, a Price column. Rows without a usable price get a stable
+    pseudo-random one so link-only files work too.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    prices = pd.to_numeric(df["Price"], errors="coerce") if "Price" in df else None
+    rows = []
+    for i, link in enumerate(df["Link"]):
+        price = prices.iloc[i] if prices is not None else None
+        if price is None or pd.isna(price):
+            price = zlib.crc32(link.encode()) % 1000000
+        rows.append((int(price), urlparse(link).path))
+    rows.sort()
+    if limit:
+        rows = rows[:limit]
+    return [price for price, _ in rows], [path for _, path in rows]
+
+
+def load_detail_pages(pages_dir=PAGES_DIR):
+    pages = []
+    for name in sorted(os.listdir(pages_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(pages_dir, name), "rb") as f:
+                pages.append(f.read())
+    if not pages:
+        raise ValueError(f"No .html detail pages in {pages_dir}")
+    return pages
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency + server.rng.random() * server.jitter)
+
+        if server.rng.random() < server.error_rate:
+            if server.rng.random() < 0.5:
+                return self._send(503, b"")
+            return self._send(429, b"", {"Retry-After": "1"})
+
+        url = urlparse(self.path)
+        if url.path.startswith("/en/real-estate"):
+            return self._send(200, self._results_page(parse_qs(url.query)))
+        if "/detail/" in url.path:
+            pages = server.detail_pages
+            return self._send(200, pages[zlib.crc32(url.path.encode()) % len(pages)])
+        return self._send(404, b"")
+
+    def _results_page(self, query):
+        server = self.server
+        lo = int(query.get("minprice", ["0"])[0])
+        hi = int(query["maxprice"][0]) if "maxprice" in query else None
+        page = int(query.get("page", ["1"])[0])
+
+        first = bisect.bisect_left(server.prices, lo)
+        end = bisect.bisect_right(server.prices, hi) if hi is not None else len(server.prices)
+        start = first + (page - 1) * CARDS_PER_PAGE
+        stop = min(start + CARDS_PER_PAGE, end)
+
+        host = f"http://{self.headers.get('Host')}"
+        cards = "".join(
+            f'<article class="list-view-item" data-url="{host}{server.paths[i]}">'
+            f'<p class="list-item-price">{server.prices[i]:,} &euro;</p></article>'
+            for i in range(start, stop)
+        )
+        if stop < end:
+            cards += '<a rel="next" href="#">Next</a>'
+        return f"<html><body>{cards}</body></html>".encode()
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if body and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=0, catalogue_file=CATALOGUE_FILE, pages_dir=PAGES_DIR, limit=None,
+                latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    server.daemon_threads = True
+    server.prices, server.paths = load_catalogue(catalogue_file, limit)
+    server.detail_pages = load_detail_pages(pages_dir)
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    return server
+
+
+def _serve(ready, kwargs):
+    server = make_server(**kwargs)
+    ready.put((server.server_address[1], len(server.prices)))
+    server.serve_forever()
+
+
+def start(**kwargs):
+    """
+    Run the fixture server in a child process, so its CPU and memory do not
+    count against the crawl being measured. Returns (process, port,
+    listings); terminate the process when done. kwargs go to make_server.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(ready, kwargs), daemon=True)
+    process.start()
+    port, listings = ready.get(timeout=60)
+    return process, port, listings
+
+
+if __name__ == "__main__":
+    server = make_server(port=8765)
+    print(f"Serving {len(server.prices)} listings on http://127.0.0.1:8765")
+    server.serve_forever()
@@ -0,0 +1,243 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import httpx
+
+from lib.detail_scraper import DetailScraper, parse_staged
+from lib.fast_extractor import IncrementalPage
+from lib.retry import FetchError, call_with_retry_async
+from lib.transport import DRAIN_LIMIT, remaining_bytes
+
+
+class AsyncDetailScraper(DetailScraper):
+    """
+    asyncio/httpx engine for detail scraping.
+
+    All requests share one pooled HTTP/2 client and a semaphore caps how many
+    are in flight, so concurrency is no longer tied to the number of OS
+    threads. Parsing runs on a separate worker pool (threads, or processes
+    with process_parse=True) through the same extractor used by
+    DetailScraper, so both engines emit identical records. With a limiter,
+    'concurrency' is only the ceiling and the limiter sets the actual level.
+    """
+
+    def __init__(self, concurrency=200, parse_workers=4, http2=True, timeout=10,
+                 process_parse=False, parse_processes=None, extractor="lxml", cache=None,
+                 limiter=None, metrics=None, partial=False, profile_file=None):
+        super().__init__(
+            max_workers=parse_workers,
+            process_parse=process_parse,
+            parse_processes=parse_processes or (parse_workers if process_parse else None),
+            extractor=extractor,
+            cache=cache,
+            metrics=metrics,
+            partial=partial,
+            profile_file=profile_file,
+        )
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        self.http2 = http2
+        self.timeout = timeout
+
+    def _make_client(self):
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+        )
+        return httpx.AsyncClient(
+            headers=self.HEADERS,
+            http2=self.http2,
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+        )
+
+    async def _fetch_async(self, client, semaphore, link):
+        """
+        Return (record, body_bytes, encoding) for link like _fetch_page.
+        Raises FetchError once the retries are used up.
+        """
+        entry = self.cache.get(link) if self.cache else None
+        headers = self.cache.conditional_headers(entry) if entry else None
+
+        async def get():
+            timings = {}
+            kwargs = {"headers": headers}
+            if self.metrics:
+                kwargs["extensions"] = {"trace": self.metrics.httpx_trace(timings)}
+            # A partial download's body is only what was read before the stop
+            bodies = []
+            if self.partial:
+                fetch = functools.partial(self._get_partial, client, bodies=bodies)
+            else:
+                fetch = client.get
+            # Backoff sleeps happen outside the semaphore
+            async with semaphore:
+                try:
+                    if self.limiter:
+                        resp = await self.limiter.call_async(fetch, link, **kwargs)
+                    else:
+                        resp = await fetch(link, **kwargs)
+                except Exception:
+                    if self.metrics:
+                        self.metrics.response(None)
+                    raise
+            body = bodies[0] if bodies else resp.content
+            if self.metrics:
+                end = time.perf_counter()
+                start = timings.get("start", end)
+                headers_at = timings.get("headers", end)
+                self.metrics.fetched(headers_at - start, end - headers_at,
+                                     resp.status_code, len(body),
+                                     resp.num_bytes_downloaded)
+            resp.raise_for_status()
+            return resp, body
+
+        resp, body = await call_with_retry_async(get, link, self.RETRY_POLICIES)
+        if self.cache is None:
+            return None, body, resp.encoding
+        return self.cache.resolve(
+            link, entry, resp.status_code, body, resp.encoding,
+            resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+        )
+
+    async def _get_partial(self, client, link, bodies, **kwargs):
+        """
+        client.get that stops downloading once IncrementalPage has every
+        field. The bytes read are appended to 'bodies', since the response
+        itself was never read to the end.
+        """
+        async with client.stream("GET", link, **kwargs) as resp:
+            page = IncrementalPage(resp.encoding)
+            chunks = []
+            stream = resp.aiter_bytes(self.PARTIAL_CHUNK_SIZE)
+            async for chunk in stream:
+                chunks.append(chunk)
+                if page.feed(chunk):
+                    break
+            # See transport.DRAIN_LIMIT: drain a short rest to keep the connection
+            remaining = remaining_bytes(resp.headers, resp.num_bytes_downloaded)
+            if remaining is not None and remaining <= DRAIN_LIMIT:
+                async for _ in stream:
+                    pass
+        bodies.append(b"".join(chunks))
+        self._count_partial(page)
+        return resp
+
+    async def _scrape_one(self, client, semaphore, parse_executor, link):
+        record, body, encoding = await self._fetch_async(client, semaphore, link)
+        if record is None:
+            loop = asyncio.get_running_loop()
+            record, timings = await loop.run_in_executor(
+                parse_executor, parse_staged, self.parse, body, link, encoding,
+                self.profiler is not None,
+            )
+            self._observe_parse(timings)
+            self._remember(link, record)
+        return record
+
+    async def _next_link(self, links):
+        # Plain sequences are read directly; other iterables (e.g. the
+        # pipeline queue) may block, so they are read off the event loop.
+        if isinstance(links, list):
+            return links.pop() if links else None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, next, links, None)
+
+    async def _scrape_all(self, links, sink, total=None, on_record=None):
+        """Scrape every link, then give retryable failures RETRY_PASSES more passes."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # The process pool outlives the run (see close()); a thread pool does not
+        parse_pool = self._get_parse_pool()
+        threads = nullcontext() if parse_pool else ThreadPoolExecutor(max_workers=self.parse_workers)
+        with threads:
+            parse_executor = parse_pool or threads
+            async with self._make_client() as client:
+                scrape = (client, semaphore, parse_executor, sink, on_record)
+                failed = []
+                await self._scrape_pass(*scrape, links, total, failed)
+                for _ in range(self.RETRY_PASSES):
+                    failed = self._file_failures(failed)
+                    if not failed:
+                        break
+                    print(f"Retrying {len(failed)} failed links in {self.RETRY_PASS_DELAY:.0f}s...")
+                    await asyncio.sleep(self.RETRY_PASS_DELAY)
+                    prior = {error.url: error.attempts for error in failed}
+                    failed = []
+                    await self._scrape_pass(*scrape, list(prior), len(prior), failed)
+                    for error in failed:
+                        error.attempts += prior[error.url]
+        for error in failed:
+            self._dead_letter(error)
+        if len(self.dead_letters):
+            print(f"Dead letters: {self.dead_letters.summary()}")
+
+    async def _scrape_pass(self, client, semaphore, parse_executor, sink, on_record,
+                           links, total, failed):
+        """One pass over links; FetchErrors are appended to 'failed'."""
+        # Reversed, so popping from the end keeps the order of a list or tuple
+        links = list(links)[::-1] if isinstance(links, (list, tuple, set)) else iter(links)
+        processed = 0
+        in_flight = set()
+        exhausted = False
+
+        while in_flight or not exhausted:
+            # Keep a bounded number of tasks alive; the semaphore
+            # limits how many of them hold a connection at once.
+            while not exhausted and len(in_flight) < self.concurrency * 2:
+                link = await self._next_link(links)
+                if link is None:
+                    exhausted = True
+                    break
+                in_flight.add(asyncio.ensure_future(
+                    self._scrape_one(client, semaphore, parse_executor, link)
+                ))
+
+            if not in_flight:
+                break
+
+            done, in_flight = await asyncio.wait(
+                in_flight, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                processed += 1
+                if isinstance(task.exception(), FetchError):
+                    error = task.exception()
+                    print(f"Request failed for {error.url}: {error}")
+                    failed.append(error)
+                    result = None
+                else:
+                    result = task.result()
+                self._progress(processed, total, result, len(in_flight))
+                if result:
+                    sink.write(result)
+                    if on_record:
+                        on_record(result)
+
+    def scrape_and_store(self, links, output_file, append=False, on_record=None,
+                         prior_records=None, dead_letter_file=None):
+        """
+        Scrape details for all links with the async engine and store them in
+        a CSV file using pandas. See DetailScraper.scrape_and_store.
+        """
+        prior_records = list(prior_records or [])
+        if not prior_records and (links is None or (isinstance(links, (list, tuple, set)) and not links)):
+            print("No links provided.")
+            return
+
+        total = len(links) if hasattr(links, "__len__") else None
+        if self.metrics and total is not None:
+            self.metrics.gauge("details_total", total)
+        with self.open_sink(output_file, append=append) as sink:
+            for record in prior_records:
+                sink.write(record)
+            asyncio.run(self._scrape_all(links or [], sink, total=total, on_record=on_record))
+        if dead_letter_file:
+            self.dead_letters.export(dead_letter_file)
+        if self.cache is not None:
+            print(self.cache.stats())
+        self._report_extraction()
@@ -0,0 +1,57 @@
+from urllib.parse import urlparse
+
+from lib import field_specs
+
+
+# Fields a search-result card and its link provide: the price on the card,
+# and the subtype, sale type and postal code in the link's slug
+# (/detail/<subtype>/<for-sale|for-rent>/<postal code>/<locality>/<id>).
+CARD_SOURCES = ("locality", "title", "price")
+CARD_FIELDS = ["Link"] + [
+    spec.field for spec in field_specs.FIELD_SPECS if spec.source in CARD_SOURCES
+]
+# Fields that are only on the detail page
+DETAIL_ONLY_FIELDS = [f for f in field_specs.DETAILS_FIELDS if f not in CARD_FIELDS]
+
+
+def slug_texts(link):
+    """
+    The header texts build_record reads, rebuilt from a detail link's slug:
+    the postal code as locality and e.g. "ground floor for sale" as title.
+    Texts the link does not have are None.
+    """
+    parts = urlparse(link).path.strip("/").split("/")
+    if "detail" not in parts:
+        return {"locality": None, "title": None}
+    slug = parts[parts.index("detail") + 1:]
+    subtype = slug[0].replace("-", " ") if len(slug) > 0 else None
+    sale = slug[1].replace("-", " ") if len(slug) > 1 else None
+    postal_code = slug[2] if len(slug) > 2 and slug[2].isdigit() else None
+    title = " ".join(t for t in (subtype, sale) if t) or None
+    return {"locality": postal_code, "title": title}
+
+
+def card_record(link, price, fields=field_specs.DETAILS_FIELDS):
+    """
+    Record with every field a results card provides, from its link and card
+    price; the DETAIL_ONLY_FIELDS stay "N/A". The texts go through the same
+    field plan as a detail page, so the codes match a full scrape.
+    """
+    return field_specs.build_record(
+        link,
+        price=str(price) if price is not None else None,
+        rows={},
+        state=None,
+        fields=fields,
+        **slug_texts(link),
+    )
+
+
+def fill_from_link(record):
+    """Fill the card fields a detail page left at "N/A" from the record's link."""
+    missing = [f for f in CARD_FIELDS if record.get(f) == "N/A"]
+    if missing:
+        card = card_record(record["Link"], None, fields=missing)
+        for field in missing:
+            record[field] = card[field]
+    return record
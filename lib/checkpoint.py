@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+
+class Checkpoint:
+    """
+    Durable progress for long crawls, so a killed run can resume.
+
+    Three files live in the checkpoint directory:
+      collector.json  the collector's cursor (price window, next page, batch)
+      links.tsv       every collected (link, card_price), appended per page
+      details.jsonl   every scraped record, appended as it completes
+
+    A restarted run replays links.tsv, continues collection from the cursor
+    and skips links already present in details.jsonl.
+    """
+
+    COLLECTOR_FILE = "collector.json"
+    LINKS_FILE = "links.tsv"
+    DETAILS_FILE = "details.jsonl"
+
+    def __init__(self, directory="src/checkpoint", sync_every=100, sync_interval=5.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+
+        self.cursor = self._load_cursor()
+        self.done = set()
+        self.records = []
+        for record in self._read_jsonl(self._path(self.DETAILS_FILE)):
+            if record["Link"] not in self.done:
+                self.done.add(record["Link"])
+                self.records.append(record)
+
+        self._links_file = open(self._path(self.LINKS_FILE), "a", encoding="utf-8")
+        self._details_file = open(self._path(self.DETAILS_FILE), "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        if self.cursor or self.done:
+            print(f"Resuming from checkpoint in {directory}: "
+                  f"{len(self.done)} details already scraped")
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_cursor(self):
+        path = self._path(self.COLLECTOR_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _read_jsonl(path):
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # A run killed mid-write can leave a truncated last line
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    # --- link collection -------------------------------------------------
+
+    def journaled_cards(self):
+        """Yield the (link, card_price) pairs collected by previous runs."""
+        path = self._path(self.LINKS_FILE)
+        if not os.path.exists(path):
+            return
+        seen = set()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 2 or parts[0] in seen:
+                    continue
+                seen.add(parts[0])
+                yield parts[0], int(parts[1]) if parts[1] else None
+
+    def save_cards(self, cards, cursor):
+        """Journal the cards of one results page, then move the cursor past it."""
+        with self.lock:
+            for link, price in cards:
+                self._links_file.write(f"{link}\t{'' if price is None else price}\n")
+            self._links_file.flush()
+            os.fsync(self._links_file.fileno())
+            self._write_cursor(cursor)
+
+    def _write_cursor(self, cursor):
+        # Write-then-rename so a crash never leaves a half-written cursor
+        path = self._path(self.COLLECTOR_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cursor, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self.cursor = cursor
+
+    # --- detail scraping -------------------------------------------------
+
+    def record_detail(self, record):
+        """Journal a scraped record; fsync every sync_every records or sync_interval seconds."""
+        with self.lock:
+            self._details_file.write(json.dumps(record) + "\n")
+            self._details_file.flush()
+            self.done.add(record["Link"])
+            self._unsynced += 1
+            now = time.monotonic()
+            if self._unsynced >= self.sync_every or now - self._last_sync >= self.sync_interval:
+                os.fsync(self._details_file.fileno())
+                self._unsynced = 0
+                self._last_sync = now
+
+    def pending(self, links):
+        """Yield the links that have no journaled record yet."""
+        for link in links:
+            if link not in self.done:
+                yield link
+
+    def close(self):
+        with self.lock:
+            for f in (self._links_file, self._details_file):
+                if not f.closed:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+
+    def clear(self):
+        """Remove the checkpoint once a run has completed."""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
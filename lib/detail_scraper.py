@@ -1,11 +1,30 @@
-import requests
-import re
 import os
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
 import pandas as pd
 
+from lib import field_specs
+from lib.card_extractor import card_record, fill_from_link
+from lib.fast_extractor import IncrementalPage, extract_fields, parse_html
+from lib.profiler import ExtractionProfiler, Profile, page_profile
+from lib.structured_data import extract_structured
+from lib.retry import DETAIL_POLICIES, DeadLetters, FetchError, call_with_retry
+from lib.sinks import CsvSink
+from lib.transport import make_session, read_body
+
+
+def parse_staged(parse, body, link, encoding, profile=False):
+    """
+    Run a DetailScraper parse method and return (record, timings) with the
+    seconds spent in its "parse" and "extract" stages, and with profile a
+    Profile of its field extractors under "profile". Module level so the
+    parse process pool can run it.
+    """
+    timings = {"profile": Profile()} if profile else {}
+    return parse(body, link, encoding, timings=timings), timings
+
 
 class DetailScraper:
 
@@ -13,264 +32,497 @@ class DetailScraper:
         "User-Agent": "Mozilla/5.0"
     }
 
-    DETAILS_FIELDS = [
-        "Link", "Locality", "Type of property", "Subtype of property",
-        "Price", "Type of sale", "Number of rooms", "Livable surface",
-        "Fully equipped kitchen", "Furnished", "Fireplace", "Terrace", "Surface terrace",
-        "Garden", "Garden area", "Total land surface", "Number of facades",
-        "Swimming pool", "State of the property"
-    ]
+    DETAILS_FIELDS = field_specs.DETAILS_FIELDS
+
+    # Records buffered before each write to the output file
+    WRITE_BATCH_SIZE = 500
+
+    # Page extractors selectable with the 'extractor' argument
+    EXTRACTORS = {
+        "lxml": "parse_detail_lxml",
+        "bs4": "parse_detail",
+        "json": "parse_detail_json",
+    }
 
-    def __init__(self, max_workers=12):
-        self.max_workers = max_workers
-        self.thread_local = threading.local()
+    # Retries per error class, and how many second passes re-run the links
+    # that failed with a retryable error once the main pass has drained
+    RETRY_POLICIES = DETAIL_POLICIES
+    RETRY_PASSES = 1
+    RETRY_PASS_DELAY = 10.0
+
+    # Read size of partial downloads: smaller chunks stop closer to the
+    # point where the page has every field, at a little more parser overhead
+    PARTIAL_CHUNK_SIZE = 4096
+
+    def __init__(self, max_workers=12, process_parse=False, parse_processes=None,
+                 extractor="lxml", cache=None, limiter=None, metrics=None, session=None,
+                 partial=False, profile_file=None):
+        # Optional AdaptiveLimiter: it decides how many requests run at once,
+        # so the pool is sized for its ceiling rather than a fixed guess.
+        self.limiter = limiter
+        self.max_workers = max(max_workers, limiter.max_limit) if limiter else max_workers
+        # Optional PageCache: conditional requests and record reuse on re-crawls
+        self.cache = cache
+        # Optional Metrics: stage timings, statuses, bytes and progress counters
+        self.metrics = metrics
+        self.parse = getattr(self, self.EXTRACTORS[extractor])
+        # With process_parse the fetch threads only download, and parsing
+        # runs in a process pool (one process per core unless overridden).
+        self.process_parse = process_parse
+        self.parse_processes = parse_processes or os.cpu_count()
+        # Started on first use and kept for every pass and batch until close()
+        self.parse_pool = None
+        # One session for all fetch threads, its pool sized to match them
+        self.session = session or make_session(self.HEADERS, self.max_workers, metrics)
+        # With partial, detail pages are only downloaded until IncrementalPage
+        # has seen every field (or the sections after them start)
+        self.partial = partial
+        # Links that still failed after every retry, with their error class
+        self.dead_letters = DeadLetters()
+        # Pages per extraction path ("json", or the reason for the HTML fallback)
+        self.extract_paths = {}
+        self.extract_lock = threading.Lock()
+        # With profile_file, time and calls per field extractor and DOM
+        # operation are collected, reported and written there as collapsed stacks
+        self.profile_file = profile_file
+        self.profiler = ExtractionProfiler(root=extractor) if profile_file else None
 
     def _get_session(self):
-        if not hasattr(self.thread_local, "session"):
-            s = requests.Session()
-            s.headers.update(self.HEADERS)
-            self.thread_local.session = s
-        return self.thread_local.session
+        return self.session
 
-    def _scrape_single(self, link):
-        """Return a dict with details, or None on failure."""
-        try:
-            session = self._get_session()
-            resp = session.get(link, timeout=10)
+    def _get_response(self, link, headers=None):
+        """
+        GET link with retries and return (response, body bytes); raises
+        FetchError if it keeps failing.
+        """
+        session = self._get_session()
+
+        def request(bodies):
+            # Stream so the time to the headers and the body download are
+            # measured separately; the body is read right away either way.
+            start = time.perf_counter()
+            try:
+                resp = session.get(link, headers=headers, timeout=10, stream=True)
+                headers_at = time.perf_counter()
+                page = IncrementalPage(resp.encoding) if self.partial else None
+                body, wire = read_body(resp, page.feed if page else None, self.PARTIAL_CHUNK_SIZE)
+                self._count_partial(page)
+            except Exception:
+                if self.metrics:
+                    self.metrics.response(None)
+                raise
+            if self.metrics:
+                self.metrics.fetched(headers_at - start, time.perf_counter() - headers_at,
+                                     resp.status_code, len(body), wire)
+            bodies.append(body)
+            return resp
+
+        def get():
+            # The limiter only passes the response through, so the body comes back here
+            bodies = []
+            resp = self.limiter.call(request, bodies) if self.limiter else request(bodies)
             resp.raise_for_status()
-        except Exception as e:
-            print(f"Request failed for {link}: {e}")
-            return None
+            return resp, bodies[0]
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        detail = {field: "N/A" for field in self.DETAILS_FIELDS}
-        detail["Link"] = link
-
-        # Locality (postal code)
-        locality_elem = soup.find("span", class_="city-line")
-        if locality_elem:
-            text = locality_elem.get_text(strip=True)
-            match = re.search(r'\d+', text)
-            detail["Locality"] = match.group() if match else "N/A"
-
-        # Subtype & Type of property
-        title_elem = soup.find("span", class_="detail__header_title_main")
-        if title_elem:
-            full_text = title_elem.get_text(strip=True)
-            normalized = full_text.lower().strip()
-
-            subtype_mappings = [
-                ("apartment", "01", "1"),
-                ("penthous", "02", "1"),
-                ("ground floor", "03", "1"),
-                ("duplex", "04", "1"),
-                ("studio", "05", "1"),
-                ("loft", "06", "1"),
-                ("triplex", "07", "1"),
-                ("residence", "11", "2"),
-                ("villa", "12", "2"),
-                ("mixed building", "13", "2"),
-                ("master house", "14", "2"),
-                ("cottage", "15", "2"),
-                ("bangalow", "16", "2"),
-                ("bungalow", "16", "2"),
-                ("chalet", "17", "2"),
-                ("mansion", "18", "2")
-            ]
-
-            subtype_mappings.sort(key=lambda x: len(x[0]), reverse=True)
-            found = False
-            for pattern, code, prop_type in subtype_mappings:
-                if normalized.startswith(pattern):
-                    detail["Type of property"] = int(prop_type)
-                    detail["Subtype of property"] = code
-                    found = True
-                    break
+        return call_with_retry(get, link, self.RETRY_POLICIES)
 
-            if not found:
-                detail["Subtype of property"] = "N/A"
-                detail["Type of property"] = "N/A"
-        else:
-            detail["Subtype of property"] = "N/A"
-            detail["Type of property"] = "N/A"
-
-        # Price
-        price_elem = soup.find("span", class_="detail__header_price_data")
-        if price_elem:
-            price_text = price_elem.get_text(strip=True)
-            digits = re.sub(r'[^\d]', '', price_text)
-            detail["Price"] = int(digits) if digits else "N/A"
-
-        # Type of sale
-        if title_elem:
-            full_text = title_elem.get_text(strip=True).lower()
-            if "rent" in full_text:
-                detail["Type of sale"] = 1
-            elif "sale" in full_text:
-                detail["Type of sale"] = 2
+    def _count_partial(self, page):
+        if self.metrics and page is not None and page.reason:
+            self.metrics.count(f"partial_{page.reason}")
+
+    def _fetch_page(self, link):
+        """
+        Fetch link, consulting the page cache when there is one.
+        Returns (record, body_bytes, encoding), where record is a cached record
+        that can be reused as-is (and body is None). Raises FetchError.
+        Raw bytes are what gets shipped to the parse processes: they pickle
+        as a single buffer copy and skip decoding on the fetch thread.
+        """
+        entry = self.cache.get(link) if self.cache else None
+        resp, body = self._get_response(
+            link, headers=self.cache.conditional_headers(entry) if entry else None
+        )
+        if self.cache is None:
+            return None, body, resp.encoding
+        return self.cache.resolve(
+            link, entry, resp.status_code, body, resp.encoding,
+            resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+        )
+
+    def _remember(self, link, record):
+        if self.cache is not None and record is not None:
+            self.cache.store_record(link, record)
+
+    def _scrape_single(self, link):
+        """Return a dict with details; raises FetchError if the page can't be fetched."""
+        record, body, encoding = self._fetch_page(link)
+        if record is None:
+            record, timings = parse_staged(self.parse, body, link, encoding,
+                                           self.profiler is not None)
+            self._observe_parse(timings)
+            self._remember(link, record)
+        return record
+
+    def _observe_parse(self, timings):
+        profile = timings.pop("profile", None)
+        if profile is not None:
+            self.profiler.merge(profile)
+        path = timings.pop("path", None)
+        if path:
+            with self.extract_lock:
+                self.extract_paths[path] = self.extract_paths.get(path, 0) + 1
+        if self.metrics:
+            if path:
+                self.metrics.count(f"extract_{path}")
+            self.metrics.observe_all(timings)
+
+    def _report_extraction(self):
+        if self.extract_stats():
+            print(self.extract_stats())
+        if self.profiler:
+            print(self.profiler.report())
+            self.profiler.export_collapsed(self.profile_file)
+
+    def extract_stats(self):
+        """Hit rate of the structured-data fast path, when the json extractor is used."""
+        with self.extract_lock:
+            paths = dict(self.extract_paths)
+        total = sum(paths.values())
+        if not total:
+            return None
+        hits = paths.get("json", 0)
+        fallbacks = ", ".join(
+            f"{reason} {count}" for reason, count in sorted(paths.items()) if reason != "json"
+        )
+        return (f"structured data: {hits}/{total} pages ({hits / total:.1%}) from embedded JSON"
+                + (f"; HTML fallback: {fallbacks}" if fallbacks else ""))
+
+    @classmethod
+    def parse_detail(cls, html, link, encoding=None, timings=None):
+        """
+        Extract the DETAILS_FIELDS record for link from a detail page's HTML.
+        'html' may be text or raw bytes; for bytes, 'encoding' is the charset
+        the response declared. A 'timings' dict receives the seconds spent
+        parsing the HTML ("parse") and reading the fields ("extract").
+        """
+        profile = page_profile(timings)
+        start = time.perf_counter()
+        with profile.span("parse"):
+            if isinstance(html, bytes):
+                soup = BeautifulSoup(html, "html.parser", from_encoding=encoding)
             else:
-                detail["Type of sale"] = "N/A"
-        else:
-            detail["Type of sale"] = "N/A"
+                soup = BeautifulSoup(html, "html.parser")
+        parsed = time.perf_counter()
+
+        def get_text(field, name, class_):
+            with profile.span(field):
+                with profile.span("find"):
+                    elem = soup.find(name, class_=class_)
+                if not elem:
+                    return None
+                with profile.span("get_text"):
+                    return elem.get_text(strip=True)
 
         # Helper to extract text from a data row by <h4> label
         def get_data_row(label):
-            h4 = soup.find("h4", string=re.compile(rf"^{re.escape(label)}$", re.I))
+            with profile.span(f"row:{label}"):
+                with profile.span("find"):
+                    h4 = soup.find("h4", string=field_specs.ROW_PATTERNS[label])
+                if h4:
+                    with profile.span("find_next_sibling"):
+                        p = h4.find_next_sibling("p")
+                    if p:
+                        with profile.span("get_text"):
+                            return p.get_text(strip=True)
+                return None
+
+        rows = {label.lower(): get_data_row(label) for label in field_specs.ROW_LABELS}
+
+        # State of the property
+        state_text = None
+        with profile.span("state"):
+            with profile.span("find"):
+                h4 = soup.find('h4', string=field_specs.STATE_PATTERN)
             if h4:
-                p = h4.find_next_sibling("p")
+                with profile.span("find_next"):
+                    p = h4.find_next('p')
                 if p:
-                    return p.get_text(strip=True)
-            return None
+                    with profile.span("get_text"):
+                        state_text = p.get_text(strip=True)
+
+        locality = get_text("locality", "span", "city-line")
+        title = get_text("title", "span", "detail__header_title_main")
+        price = get_text("price", "span", "detail__header_price_data")
+        with profile.span("build_record"):
+            record = cls.build_record(
+                link, locality=locality, title=title, price=price, rows=rows, state=state_text,
+            )
+        if timings is not None:
+            timings["parse"] = parsed - start
+            timings["extract"] = time.perf_counter() - parsed
+        return record
+
+    @classmethod
+    def parse_detail_lxml(cls, html, link, encoding=None, timings=None):
+        """
+        Same record as parse_detail, but the page is parsed once with lxml and
+        all fields are read from a single pass over the tree.
+        """
+        profile = page_profile(timings)
+        start = time.perf_counter()
+        with profile.span("parse"):
+            root = parse_html(html, encoding)
+        parsed = time.perf_counter()
+        with profile.span("extract_fields"):
+            texts = extract_fields(root)
+        with profile.span("build_record"):
+            record = cls.build_record(link, **texts)
+        if timings is not None:
+            timings["parse"] = parsed - start
+            timings["extract"] = time.perf_counter() - parsed
+        return record
+
+    @classmethod
+    def parse_detail_json(cls, html, link, encoding=None, timings=None):
+        """
+        Fast path: read the record from the JSON the page embeds (JSON-LD or a
+        data-layer push) without building a DOM; pages whose blob is missing
+        or does not cover every field go through parse_detail_lxml. 'timings'
+        also receives the path taken ("json", "no_blob" or "incomplete").
+        """
+        profile = page_profile(timings)
+        start = time.perf_counter()
+        with profile.span("scan"):
+            texts, reason = extract_structured(html, link, encoding)
+        parsed = time.perf_counter()
+        if texts is None:
+            with profile.span(f"fallback:{reason}"):
+                record = cls.parse_detail_lxml(html, link, encoding, timings=timings)
+            if timings is not None:
+                # The scan that found nothing counts towards the parse stage
+                timings["parse"] += parsed - start
+                timings["path"] = reason
+            return record
+        with profile.span("build_record"):
+            record = cls.build_record(link, **texts)
+        if timings is not None:
+            timings["parse"] = parsed - start
+            timings["extract"] = time.perf_counter() - parsed
+            timings["path"] = "json"
+        return record
+
+    @classmethod
+    def build_record(cls, link, locality, title, price, rows, state):
+        """
+        Turn the raw texts found on a detail page into a DETAILS_FIELDS record.
+        'rows' maps lower-cased <h4> labels to their <p> text; any text that
+        was not found on the page is None. Header fields the page lacks are
+        taken from the link's slug where it has them.
+        """
+        return fill_from_link(field_specs.build_record(
+            link, locality, title, price, rows, state, fields=cls.DETAILS_FIELDS
+        ))
+
+    def _scrape_iter(self, links, total=None):
+        """
+        Scrape links from any iterable and yield each result as it completes.
+        At most max_workers * 2 links are in flight, so a generator feeding
+        this method is consumed only as fast as pages are scraped. Links that
+        failed with a retryable error are tried again in up to RETRY_PASSES
+        further passes; whatever still fails ends up in dead_letters.
+        """
+        failed = []
+        yield from self._scrape_pass(links, total, failed)
+        for _ in range(self.RETRY_PASSES):
+            failed = self._file_failures(failed)
+            if not failed:
+                break
+            print(f"Retrying {len(failed)} failed links in {self.RETRY_PASS_DELAY:.0f}s...")
+            time.sleep(self.RETRY_PASS_DELAY)
+            prior = {error.url: error.attempts for error in failed}
+            failed = []
+            yield from self._scrape_pass(list(prior), len(prior), failed)
+            for error in failed:
+                error.attempts += prior[error.url]
+        for error in failed:
+            self._dead_letter(error)
+        if len(self.dead_letters):
+            print(f"Dead letters: {self.dead_letters.summary()}")
+
+    def _file_failures(self, failed):
+        """Send failures that are not worth another pass to dead_letters; return the rest."""
+        retry = []
+        for error in failed:
+            if self.RETRY_POLICIES[error.error_class].requeue:
+                retry.append(error)
+            else:
+                self._dead_letter(error)
+        if self.metrics:
+            self.metrics.count("details_retried", len(retry))
+        return retry
+
+    def _dead_letter(self, error):
+        self.dead_letters.add(error)
+        if self.metrics:
+            self.metrics.count("details_failed")
+
+    def _progress(self, processed, total, result, in_flight):
+        """Count a finished link; without metrics, print a line every 10 links."""
+        if self.metrics:
+            if result:
+                self.metrics.count("details_scraped")
+            self.metrics.gauge("in_flight", in_flight)
+        elif processed % 10 == 0:
+            print(f"{processed}/{total if total else '?'} processed")
+
+    def scrape_batch(self, links, failed):
+        """
+        Scrape links once, without the retry passes, and yield each record
+        as it completes. FetchErrors are appended to 'failed' so the caller
+        can decide about retries (e.g. a work queue's own attempts).
+        """
+        links = list(links)
+        return self._scrape_pass(links, len(links), failed)
 
-        # Number of bedrooms
-        bedrooms_text = get_data_row("Number of bedrooms")
-        if bedrooms_text:
-            digits = re.sub(r'[^\d]', '', bedrooms_text)
-            bedrooms = int(digits) if digits else None
-        else:
-            bedrooms = None
-        detail["Number of rooms"] = bedrooms if bedrooms is not None else "N/A"
-
-        # Living area
-        living_text = get_data_row("Livable surface")
-        if living_text:
-            digits = re.sub(r'[^\d]', '', living_text)
-            living_area = int(digits) if digits else None
-        else:
-            living_area = None
-        detail["Livable surface"] = living_area if living_area is not None else "N/A"
-
-        # Fully equipped kitchen
-        kitchen_text = get_data_row("Kitchen equipment")
-        if kitchen_text:
-            detail["Fully equipped kitchen"] = 0 if kitchen_text.lower() == "no" else 1
-        else:
-            detail["Fully equipped kitchen"] = "N/A"
-
-        # Furnished
-        furnished_text = get_data_row("Furnished")
-        if furnished_text:
-            detail["Furnished"] = 0 if furnished_text.lower() == "no" else 1
-        else:
-            detail["Furnished"] = "N/A"
-
-        # Fireplace
-        fire_text = get_data_row("Fireplace")
-        if fire_text:
-            detail["Fireplace"] = 0 if fire_text.lower() == "no" else 1
-        else:
-            detail["Fireplace"] = "N/A"
-
-        # Terrace
-        terrace_text = get_data_row("Terrace")
-        if terrace_text:
-            detail["Terrace"] = 0 if terrace_text.lower() == "no" else 1
-        else:
-            detail["Terrace"] = "N/A"
-
-        # Terrace area
-        terrace_area_text = get_data_row("Surface terrace")
-        if terrace_area_text:
-            digits = re.sub(r'[^\d]', '', terrace_area_text)
-            terrace_area = int(digits) if digits else None
-        else:
-            terrace_area = None
-        detail["Surface terrace"] = terrace_area if terrace_area is not None else "N/A"
-
-        # Garden
-        garden_text = get_data_row("Garden")
-        if garden_text:
-            detail["Garden"] = 0 if garden_text.lower() == "no" else 1
-        else:
-            detail["Garden"] = "N/A"
-
-        # Total land surface
-        land_text = get_data_row("Total land surface")
-        if land_text:
-            digits = re.sub(r'[^\d]', '', land_text)
-            land_area = int(digits) if digits else None
-        else:
-            land_area = None
-        detail["Total land surface"] = land_area if land_area is not None else "N/A"
-
-        # Number of facades
-        facades_text = get_data_row("Number of facades")
-        if facades_text:
-            digits = re.sub(r'[^\d]', '', facades_text)
-            facades = int(digits) if digits else None
-        else:
-            facades = None
-        detail["Number of facades"] = facades if facades is not None else "N/A"
-
-        # Swimming pool
-        pool_text = get_data_row("Swimming pool")
-        if pool_text:
-            detail["Swimming pool"] = 0 if pool_text.lower() == "no" else 1
-        else:
-            detail["Swimming pool"] = "N/A"
+    def _scrape_pass(self, links, total, failed):
+        """One pass over links; FetchErrors are appended to 'failed'."""
+        max_in_flight = self.max_workers * 2
+        processed = 0
+        parse_pool = self._get_parse_pool()
 
-        # State of the property
-        state_text = "N/A"
-        h4 = soup.find('h4', string=re.compile(r'State of the property', re.I))
-        if h4:
-            p = h4.find_next('p')
-            if p:
-                state_text = p.get_text(strip=True)
-
-        state_mapping = {
-            "new": 1,
-            "excellent": 2,
-            "fully renovated": 3,
-            "normal": 4,
-            "to renovate": 5,
-            "to be renovated": 5,
-        }
-
-        if state_text and state_text != "N/A":
-            lower_text = state_text.lower().strip()
-            matched_code = "N/A"
-            for key, code in state_mapping.items():
-                if key in lower_text:
-                    matched_code = code
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = set()
+            fetching = {}
+            parsing = {}
+            links = iter(links)
+            exhausted = False
+
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    link = next(links, None)
+                    if link is None:
+                        exhausted = True
+                        break
+                    if parse_pool:
+                        future = executor.submit(self._fetch_page, link)
+                        fetching[future] = link
+                    else:
+                        future = executor.submit(self._scrape_single, link)
+                    in_flight.add(future)
+
+                if not in_flight:
                     break
-            detail["State of the property"] = matched_code
-        else:
-            detail["State of the property"] = "N/A"
 
-        return detail
-
-    def scrape_and_store(self, links, output_file):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    fetch_error = future.exception()
+                    if isinstance(fetch_error, FetchError):
+                        fetching.pop(future, None)
+                        print(f"Request failed for {fetch_error.url}: {fetch_error}")
+                        failed.append(fetch_error)
+                        result = None
+                    elif future in fetching:
+                        # Fetch stage finished: hand the bytes to the parse stage.
+                        link = fetching.pop(future)
+                        fetched = future.result()
+                        if fetched[0] is not None:
+                            result = fetched[0]
+                        else:
+                            _, body, encoding = fetched
+                            parse_future = parse_pool.submit(parse_staged, self.parse, body, link,
+                                                             encoding, self.profiler is not None)
+                            parsing[parse_future] = link
+                            in_flight.add(parse_future)
+                            continue
+                    elif future in parsing:
+                        result, timings = future.result()
+                        self._observe_parse(timings)
+                        self._remember(parsing.pop(future), result)
+                    else:
+                        result = future.result()
+
+                    processed += 1
+                    self._progress(processed, total, result, len(in_flight))
+                    if result:
+                        yield result
+
+    def _get_parse_pool(self):
+        """
+        Process pool for the parse stage, or None to parse on the fetch
+        threads. The processes are started once and reused by every pass
+        and scrape_batch call until close().
+        """
+        if not self.process_parse:
+            return None
+        if self.parse_pool is None:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_processes)
+        return self.parse_pool
+
+    def close(self):
+        """Shut down the parse processes, if any were started."""
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+
+    def open_sink(self, output_file, append=False):
+        """The record sink for output_file: Parquet for a .parquet name, else CSV."""
+        if output_file.endswith(".parquet"):
+            # Imported here so pyarrow is only needed for Parquet output
+            from lib.parquet_sink import ParquetSink
+            return ParquetSink(output_file, self.DETAILS_FIELDS, append=append)
+        return CsvSink(output_file, self.DETAILS_FIELDS,
+                       batch_size=self.WRITE_BATCH_SIZE, append=append)
+
+    @staticmethod
+    def load_details(output_file):
+        """Load a details file, keeping only the latest row for each Link."""
+        if output_file.endswith(".parquet"):
+            return pd.read_parquet(output_file, dtype_backend="numpy_nullable")
+        df = pd.read_csv(output_file, encoding='utf-8')
+        return df.drop_duplicates(subset="Link", keep="last").reset_index(drop=True)
+
+    def store_cards(self, cards, output_file):
+        """
+        Write a card-only record (see card_extractor.card_record) for every
+        (link, card_price) pair, without fetching any detail page.
+        """
+        count = 0
+        with self.open_sink(output_file) as sink:
+            for link, price in cards:
+                sink.write(card_record(link, price, self.DETAILS_FIELDS))
+                count += 1
+                if self.metrics:
+                    self.metrics.count("details_scraped")
+        print(f"Stored {count} card records in {output_file}")
+
+    def scrape_and_store(self, links, output_file, append=False, on_record=None,
+                         prior_records=None, dead_letter_file=None):
         """
         Scrape details for all links and store them in a CSV file using pandas.
+        'links' may be a list or any iterable, such as a generator fed by the
+        link collector. With append=True records are added to an existing file
+        instead of replacing it; on_record is called with every scraped record.
+        prior_records (e.g. from a resumed checkpoint) are written first.
+        Links that still fail after retrying are appended to dead_letter_file.
         """
-        if not links:
+        prior_records = list(prior_records or [])
+        if not prior_records and (links is None or (isinstance(links, (list, tuple, set)) and not links)):
             print("No links provided.")
             return
 
-        # Ensure the output directory exists
-        output_dir = os.path.dirname(output_file)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
-
-        results = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [executor.submit(self._scrape_single, link) for link in links]
-
-            for i, future in enumerate(as_completed(futures), start=1):
-                result = future.result()
-                if result:
-                    results.append(result)
-                if i % 10 == 0:
-                    print(f"{i}/{len(links)} processed")
-
-        # Write all results at once with pandas
-        if results:
-            df = pd.DataFrame(results, columns=self.DETAILS_FIELDS)
-            # If file already exists, we may want to append. Here we overwrite.
-            # To append without duplicates, you would need to read existing, combine, deduplicate.
-            # For simplicity, we'll write a new file each time.
-            df.to_csv(output_file, index=False, encoding='utf-8')
-            print(f"Saved {len(results)} records to {output_file}")
-        else:
-            print("No data scraped, file not written.")
\ No newline at end of file
+        total = len(links) if hasattr(links, "__len__") else None
+        if self.metrics and total is not None:
+            self.metrics.gauge("details_total", total)
+        # Records go to disk in WRITE_BATCH_SIZE batches as they complete
+        with self.open_sink(output_file, append=append) as sink:
+            for record in prior_records:
+                sink.write(record)
+            for record in self._scrape_iter(links or [], total=total):
+                sink.write(record)
+                if on_record:
+                    on_record(record)
+        if dead_letter_file:
+            self.dead_letters.export(dead_letter_file)
+        if self.cache is not None:
+            print(self.cache.stats())
+        self._report_extraction()
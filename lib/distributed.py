@@ -0,0 +1,239 @@
+"""
+Distributed crawl over a shared WorkQueue.
+
+Run one coordinator and any number of workers (on one machine or several
+sharing the queue file), from the repository root:
+    python -m lib.distributed coordinator [--queue PATH] [--output FILE]
+    python -m lib.distributed worker [--queue PATH] [--id NAME]
+
+The coordinator probes listing density and queues the price bands. Workers
+lease bands, walk them with LinkCollector and queue every detail link they
+find (and the split remainder of a band that hit the page ceiling); they
+lease detail links in batches and scrape them with DetailScraper, acking
+each record into the queue. When nothing is left, the coordinator writes
+all records to the output file and the failed links to the failed file.
+"""
+import argparse
+import csv
+import os
+import socket
+import threading
+import time
+
+from lib.detail_scraper import DetailScraper
+from lib.link_collector import LinkCollector
+from lib.listing_ids import listing_id, listing_key
+from lib.metrics import Metrics, MetricsReporter
+from lib.rate_limiter import AdaptiveLimiter
+from lib.transport import make_session
+from lib.work_queue import WorkQueue
+
+BAND = "band"
+DETAIL = "detail"
+
+
+def put_links(queue, links):
+    """Queue detail links once per listing, however their URLs differ."""
+    links = list(links)
+    return queue.put(DETAIL, links, keys=[listing_key(listing_id(link)) for link in links])
+
+
+class Coordinator:
+    """Seeds the queue with price bands and exports the results at the end."""
+
+    def __init__(self, queue, collector=None, max_pages=50):
+        self.queue = queue
+        self.collector = collector or LinkCollector()
+        self.max_pages = max_pages
+
+    def seed(self, fresh=False):
+        """
+        Queue the planned price bands. A queue with pending or leased items
+        is resumed as is; a finished one (or any, with fresh) is cleared
+        and a new round starts.
+        """
+        if self.queue.unfinished() and not fresh:
+            print(f"Resuming: {self.queue.stats()}")
+            return
+        if self.queue.counts():
+            print(f"Starting a new round, clearing {self.queue.stats()}")
+            self.queue.reset()
+        print("Probing listing density...")
+        bands = self.collector.plan_price_bands(
+            self.collector.probe_density(), max_pages=self.max_pages
+        )
+        self.queue.put(BAND, [list(band) for band in bands])
+        print(f"Queued {len(bands)} price bands")
+
+    def seed_links(self, links):
+        """Queue detail links directly, e.g. the changed links of an incremental run."""
+        added = put_links(self.queue, links)
+        print(f"Queued {added} detail links")
+
+    def wait(self, poll=10.0):
+        """Block until every item is done or failed, printing the queue state."""
+        while self.queue.unfinished():
+            print(self.queue.stats())
+            time.sleep(poll)
+        print(self.queue.stats())
+
+    def export(self, scraper, output_file, failed_file=None):
+        """Write the scraped records with the scraper's sink; failed links go to failed_file."""
+        with scraper.open_sink(output_file) as sink:
+            for _, record, _ in self.queue.iter_results(DETAIL):
+                if record:
+                    sink.write(record)
+
+        failed = list(self.queue.iter_results(DETAIL, WorkQueue.FAILED))
+        if failed and failed_file:
+            file_exists = os.path.exists(failed_file)
+            with open(failed_file, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if not file_exists:
+                    writer.writerow(["Link", "Error"])
+                for link, _, error in failed:
+                    writer.writerow([link, error])
+            print(f"Appended {len(failed)} failed links to {failed_file}")
+        bands = list(self.queue.iter_results(BAND, WorkQueue.FAILED))
+        if bands:
+            # Listings in these price ranges may be missing from the output
+            print(f"{len(bands)} price bands could not be walked: {[band for band, _, _ in bands]}")
+
+
+class Worker:
+    """
+    Leases work from the queue until it is empty: bands first (they produce
+    more work), then batches of detail links. A heartbeat thread keeps the
+    leases of the items in hand alive; if the worker dies, they expire and
+    another worker picks them up.
+    """
+
+    def __init__(self, queue, collector, scraper, worker_id=None, lease_seconds=120,
+                 batch_size=50, max_pages=50, idle_wait=5.0):
+        self.queue = queue
+        self.collector = collector
+        self.scraper = scraper
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.max_pages = max_pages
+        self.idle_wait = idle_wait
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _hold(self, items):
+        with self._held_lock:
+            self._held = {item.id for item in items}
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._held_lock:
+                held = list(self._held)
+            if held:
+                self.queue.heartbeat(self.worker_id, held, self.lease_seconds)
+
+    def run(self):
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        print(f"Worker {self.worker_id} started")
+        try:
+            while True:
+                items = self.queue.lease(self.worker_id, BAND, 1, self.lease_seconds)
+                if items:
+                    self._hold(items)
+                    self._walk_band(items[0])
+                    continue
+                items = self.queue.lease(self.worker_id, DETAIL, self.batch_size, self.lease_seconds)
+                if items:
+                    self._hold(items)
+                    self._scrape(items)
+                    continue
+                self._hold([])
+                # Other workers may still add links or let a lease expire
+                if not self.queue.unfinished():
+                    break
+                time.sleep(self.idle_wait)
+        finally:
+            self._stop.set()
+            heartbeat.join()
+        print(f"Worker {self.worker_id} finished: {self.queue.stats()}")
+
+    def _walk_band(self, item):
+        lo, hi = item.payload
+        cards, remainder, error = self.collector.walk_band(lo, hi, self.max_pages)
+        added = put_links(self.queue, [link for link, _ in cards])
+        print(f"Band {lo}-{hi if hi is not None else 'max'}: {len(cards)} links, {added} new")
+
+        if error:
+            if remainder == (lo, hi):
+                # No progress at all: retry the band itself (or fail it)
+                self.queue.nack(self.worker_id, item.id, str(error))
+                return
+            self.queue.put(BAND, [list(remainder)])
+        elif remainder:
+            self.queue.put(BAND, [list(band) for band in self.collector.split_band(*remainder)])
+        self.queue.ack(self.worker_id, [(item.id, {"links": len(cards)})])
+
+    def _scrape(self, items):
+        ids = {item.payload: item.id for item in items}
+        failed = []
+        acks = []
+        for record in self.scraper.scrape_batch(list(ids), failed):
+            acks.append((ids[record["Link"]], record))
+            if len(acks) >= 10:
+                self.queue.ack(self.worker_id, acks)
+                acks = []
+        self.queue.ack(self.worker_id, acks)
+
+        # The queue's own attempts replace the scraper's second retry pass
+        for error in failed:
+            retry = self.scraper.RETRY_POLICIES[error.error_class].requeue
+            self.queue.nack(self.worker_id, ids[error.url], str(error), retry=retry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed immovlan crawl")
+    parser.add_argument("role", choices=["coordinator", "worker"])
+    parser.add_argument("--queue", default="src/work_queue.sqlite")
+    parser.add_argument("--output", default="property_details.csv")
+    parser.add_argument("--failed", default="property_failed.csv")
+    parser.add_argument("--id", default=None, help="worker name (default: host-pid)")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--fresh", action="store_true",
+                        help="coordinator: start a new round even if the queue has unfinished work")
+    parser.add_argument("--process-parse", action="store_true",
+                        help="worker: parse detail pages in a process pool kept for every batch")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue)
+    if args.role == "coordinator":
+        coordinator = Coordinator(queue)
+        coordinator.seed(fresh=args.fresh)
+        coordinator.wait()
+        coordinator.export(DetailScraper(), args.output, args.failed)
+    else:
+        # Each node adapts its own request rate, since limits apply per source IP
+        metrics = Metrics()
+        limiter = AdaptiveLimiter()
+        metrics.track("concurrency_limit", lambda: limiter.limit)
+        session = make_session(DetailScraper.HEADERS, limiter.max_limit, metrics)
+        scraper = DetailScraper(limiter=limiter, metrics=metrics, session=session,
+                                process_parse=args.process_parse)
+        reporter = MetricsReporter(metrics, interval=30).start()
+        try:
+            Worker(
+                queue,
+                LinkCollector(limiter=limiter, metrics=metrics, session=session),
+                scraper,
+                worker_id=args.id,
+                batch_size=args.batch_size,
+            ).run()
+        finally:
+            reporter.stop()
+            scraper.close()
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import lxml.etree
+import lxml.html
+
+from lib.field_specs import ROW_LABELS
+
+
+LOCALITY_CLASS = "city-line"
+TITLE_CLASS = "detail__header_title_main"
+PRICE_CLASS = "detail__header_price_data"
+STATE_LABEL = "state of the property"
+
+# Sections that come after every field the extractors read, as (tag, class)
+# with class None for any element of that tag. A partial download stops as
+# soon as one of them starts.
+STOP_SECTIONS = (
+    ("section", "description"),
+    ("section", "related-listings"),
+    ("footer", None),
+)
+
+
+def _text(el):
+    """Same as BeautifulSoup's get_text(strip=True): strip every text node and join."""
+    return "".join(t.strip() for t in el.xpath(".//text()"))
+
+
+def _only_string(el):
+    """
+    Mirror BeautifulSoup's Tag.string: the text of an element whose only
+    child is a single string (possibly inside a single nested tag).
+    """
+    children = list(el)
+    if not children:
+        return el.text
+    if len(children) == 1 and not el.text and not children[0].tail \
+            and isinstance(children[0].tag, str):
+        return _only_string(children[0])
+    return None
+
+
+def _next_sibling_p(el):
+    for sibling in el.itersiblings():
+        if sibling.tag == "p":
+            return sibling
+    return None
+
+
+def extract_page(html, encoding=None):
+    """
+    Parse a detail page once with lxml and return the raw texts that
+    DetailScraper.build_record needs, as keyword arguments.
+    """
+    return extract_fields(parse_html(html, encoding))
+
+
+def parse_html(html, encoding=None):
+    """
+    Parse page text or raw bytes (in the declared encoding) into an lxml tree.
+    Returns None for a page with no elements (empty, whitespace or only
+    comments), which lxml refuses to parse.
+    """
+    try:
+        if isinstance(html, bytes):
+            parser = lxml.html.HTMLParser(encoding=encoding)
+            return lxml.html.document_fromstring(html, parser=parser)
+        return lxml.html.document_fromstring(html)
+    except lxml.etree.ParserError:
+        return None
+
+
+def extract_fields(root):
+    """
+    Read the raw texts for build_record from a parsed detail page.
+
+    The header spans and every <h4>/<p> feature row are collected in a
+    single walk over the tree, instead of one full-tree search per field.
+    An empty page (root None) has none of the texts, like with BeautifulSoup.
+    """
+    spans = {}
+    rows = {}
+    state = None
+    state_seen = False
+
+    for el in root.iter("span", "h4") if root is not None else ():
+        if el.tag == "span":
+            classes = (el.get("class") or "").split()
+            for cls in (LOCALITY_CLASS, TITLE_CLASS, PRICE_CLASS):
+                if cls in classes and cls not in spans:
+                    spans[cls] = _text(el)
+            continue
+
+        label = _only_string(el)
+        if label is None:
+            continue
+        key = label[:-1] if label.endswith("\n") else label
+        key = key.lower()
+
+        # The first <h4> with a given label wins, even without a <p> next to it
+        if key not in rows:
+            p = _next_sibling_p(el)
+            rows[key] = _text(p) if p is not None else None
+
+        # "State of the property" takes the next <p> anywhere after the label
+        if not state_seen and STATE_LABEL in label.lower():
+            state_seen = True
+            following = el.xpath("(descendant::p | following::p)[1]")
+            if following:
+                state = _text(following[0])
+
+    return {
+        "locality": spans.get(LOCALITY_CLASS),
+        "title": spans.get(TITLE_CLASS),
+        "price": spans.get(PRICE_CLASS),
+        "rows": rows,
+        "state": state,
+    }
+
+
+class IncrementalPage:
+    """
+    Decides when enough of a detail page has arrived. Chunks are fed to an
+    lxml pull parser while the page downloads; feed() returns True once
+    extract_fields would find nothing new in the rest of the page: every
+    header span and feature row has been resolved, or one of stop_sections
+    has started. 'reason' then says which ("complete" or "marker").
+    """
+
+    def __init__(self, encoding=None, stop_sections=STOP_SECTIONS):
+        self.parser = lxml.etree.HTMLPullParser(events=("start", "end"), encoding=encoding)
+        self.stop_sections = stop_sections
+        self.spans = {LOCALITY_CLASS, TITLE_CLASS, PRICE_CLASS}
+        self.rows = {label.lower() for label in ROW_LABELS}
+        # <h4> elements whose <p> has not been seen yet, and whether the
+        # state label was found and still waits for its <p>
+        self.pending = []
+        self.state = None
+        self.reason = None
+
+    def _stops(self, el):
+        classes = (el.get("class") or "").split()
+        return any(el.tag == tag and (cls is None or cls in classes)
+                   for tag, cls in self.stop_sections)
+
+    def feed(self, chunk):
+        if self.reason:
+            return True
+        self.parser.feed(chunk)
+        for event, el in self.parser.read_events():
+            if event == "start":
+                if self._stops(el):
+                    self.reason = "marker"
+                    return True
+                continue
+            if el.tag == "span":
+                self.spans.difference_update((el.get("class") or "").split())
+            elif el.tag == "h4":
+                self._label(el)
+            elif el.tag == "p":
+                if self.state == "pending":
+                    self.state = "done"
+                # A row is resolved by the first <p> sibling after its <h4>
+                self.pending = [h4 for h4 in self.pending
+                                if h4.getparent() is not el.getparent()]
+            # A row whose parent closed without a <p> is resolved as empty
+            self.pending = [h4 for h4 in self.pending if h4.getparent() is not el]
+
+        if not self.spans and not self.rows and not self.pending and self.state == "done":
+            self.reason = "complete"
+        return self.reason is not None
+
+    def _label(self, el):
+        label = _only_string(el)
+        if label is None:
+            return
+        key = label[:-1] if label.endswith("\n") else label
+        key = key.lower()
+        if key in self.rows:
+            self.rows.discard(key)
+            self.pending.append(el)
+        if self.state is None and STATE_LABEL in label.lower():
+            self.state = "pending"
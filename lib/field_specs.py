@@ -0,0 +1,171 @@
+import re
+from collections import namedtuple
+
+
+DETAILS_FIELDS = [
+    "Link", "Locality", "Type of property", "Subtype of property",
+    "Price", "Type of sale", "Number of rooms", "Livable surface",
+    "Fully equipped kitchen", "Furnished", "Fireplace", "Terrace", "Surface terrace",
+    "Garden", "Garden area", "Total land surface", "Number of facades",
+    "Swimming pool", "State of the property"
+]
+
+# (title prefix, subtype code, property type)
+SUBTYPE_MAPPINGS = [
+    ("apartment", "01", 1),
+    ("penthous", "02", 1),
+    ("ground floor", "03", 1),
+    ("duplex", "04", 1),
+    ("studio", "05", 1),
+    ("loft", "06", 1),
+    ("triplex", "07", 1),
+    ("residence", "11", 2),
+    ("villa", "12", 2),
+    ("mixed building", "13", 2),
+    ("master house", "14", 2),
+    ("cottage", "15", 2),
+    ("bangalow", "16", 2),
+    ("bungalow", "16", 2),
+    ("chalet", "17", 2),
+    ("mansion", "18", 2),
+]
+
+SALE_MAPPING = [
+    ("rent", 1),
+    ("sale", 2),
+]
+
+STATE_MAPPING = [
+    ("new", 1),
+    ("excellent", 2),
+    ("fully renovated", 3),
+    ("normal", 4),
+    ("to renovate", 5),
+    ("to be renovated", 5),
+]
+
+# One entry per extracted field.
+#   source:  "locality", "title", "price" or "state" for the header texts,
+#            "row" for an <h4>/<p> feature row named by 'label'
+#   kind:    "number"   first run of digits, kept as text (postal code)
+#            "digits"   all digits joined into an int
+#            "flag"     0 for "no", 1 for anything else
+#            "prefix"   first mapping key the text starts with
+#            "contains" first mapping key found in the text
+FieldSpec = namedtuple("FieldSpec", "field source kind label mapping")
+FieldSpec.__new__.__defaults__ = (None, None)
+
+FIELD_SPECS = [
+    FieldSpec("Locality", "locality", "number"),
+    FieldSpec("Type of property", "title", "prefix",
+              mapping=[(prefix, prop_type) for prefix, _, prop_type in SUBTYPE_MAPPINGS]),
+    FieldSpec("Subtype of property", "title", "prefix",
+              mapping=[(prefix, code) for prefix, code, _ in SUBTYPE_MAPPINGS]),
+    FieldSpec("Price", "price", "digits"),
+    FieldSpec("Type of sale", "title", "contains", mapping=SALE_MAPPING),
+    FieldSpec("Number of rooms", "row", "digits", label="Number of bedrooms"),
+    FieldSpec("Livable surface", "row", "digits", label="Livable surface"),
+    FieldSpec("Fully equipped kitchen", "row", "flag", label="Kitchen equipment"),
+    FieldSpec("Furnished", "row", "flag", label="Furnished"),
+    FieldSpec("Fireplace", "row", "flag", label="Fireplace"),
+    FieldSpec("Terrace", "row", "flag", label="Terrace"),
+    FieldSpec("Surface terrace", "row", "digits", label="Surface terrace"),
+    FieldSpec("Garden", "row", "flag", label="Garden"),
+    FieldSpec("Total land surface", "row", "digits", label="Total land surface"),
+    FieldSpec("Number of facades", "row", "digits", label="Number of facades"),
+    FieldSpec("Swimming pool", "row", "flag", label="Swimming pool"),
+    FieldSpec("State of the property", "state", "contains", mapping=STATE_MAPPING),
+]
+
+_NUMBER_RE = re.compile(r"\d+")
+_NON_DIGIT_RE = re.compile(r"[^\d]")
+
+
+def _number(text):
+    match = _NUMBER_RE.search(text)
+    return match.group() if match else "N/A"
+
+
+def _digits(text):
+    digits = _NON_DIGIT_RE.sub("", text)
+    return int(digits) if digits else "N/A"
+
+
+def _flag(text):
+    return 0 if text.lower() == "no" else 1
+
+
+def _prefix(mapping):
+    # Longest prefix first, so "penthous" is not shadowed by a shorter key
+    ordered = tuple(sorted(mapping, key=lambda item: len(item[0]), reverse=True))
+
+    def convert(text):
+        normalized = text.lower().strip()
+        for prefix, value in ordered:
+            if normalized.startswith(prefix):
+                return value
+        return "N/A"
+    return convert
+
+
+def _contains(mapping):
+    ordered = tuple(mapping)
+
+    def convert(text):
+        lower_text = text.lower()
+        for key, value in ordered:
+            if key in lower_text:
+                return value
+        return "N/A"
+    return convert
+
+
+_CONVERTERS = {
+    "number": lambda spec: _number,
+    "digits": lambda spec: _digits,
+    "flag": lambda spec: _flag,
+    "prefix": lambda spec: _prefix(spec.mapping),
+    "contains": lambda spec: _contains(spec.mapping),
+}
+
+
+def compile_plan(specs):
+    """Turn field specs into (field, source, row_key, converter) steps."""
+    return [
+        (
+            spec.field,
+            spec.source,
+            spec.label.lower() if spec.source == "row" else None,
+            _CONVERTERS[spec.kind](spec),
+        )
+        for spec in specs
+    ]
+
+
+PLAN = compile_plan(FIELD_SPECS)
+
+# <h4> labels of the feature rows, with anchored case-insensitive patterns
+# for extractors that search the page label by label
+ROW_LABELS = [spec.label for spec in FIELD_SPECS if spec.source == "row"]
+ROW_PATTERNS = {
+    label: re.compile(rf"^{re.escape(label)}$", re.I) for label in ROW_LABELS
+}
+STATE_PATTERN = re.compile(r"State of the property", re.I)
+
+
+def build_record(link, locality, title, price, rows, state, fields=DETAILS_FIELDS):
+    """
+    Turn the raw texts found on a detail page into a record with 'fields'.
+    'rows' maps lower-cased <h4> labels to their <p> text; any text that
+    was not found on the page is None and leaves its field at "N/A".
+    """
+    texts = {"locality": locality, "title": title, "price": price, "state": state}
+    detail = dict.fromkeys(fields, "N/A")
+    detail["Link"] = link
+
+    for field, source, row_key, convert in PLAN:
+        text = rows.get(row_key) if row_key else texts[source]
+        if text and field in detail:
+            detail[field] = convert(text)
+
+    return detail
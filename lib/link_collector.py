@@ -1,7 +1,13 @@
-import requests
 import re
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
 
+from lib.listing_ids import ListingIds
+from lib.retry import PAGE_POLICIES, FetchError, call_with_retry
+from lib.transport import make_session
+
 
 class LinkCollector:
 
@@ -12,6 +18,7 @@ class LinkCollector:
     }
 
     PRICE_FROM_PARAM = "minprice"
+    PRICE_TO_PARAM = "maxprice"
     SORT_PARAM = "sortby"
     SORT_DIRECTION_PARAM = "sortdirection"
     SORT_VALUE = "price"
@@ -22,9 +29,80 @@ class LinkCollector:
     PRICE_SELECTOR = ".list-item-price"
     PROJECT_EXCLUDE = "/projectdetail/"
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(self.HEADERS)
+    # Price points probed to estimate listing density before sharding.
+    # Rentals sit in the low range, sales from ~50k upwards.
+    PROBE_PRICES = [
+        0, 500, 1000, 1500, 2500, 5000, 50000, 100000, 150000, 200000,
+        250000, 300000, 400000, 500000, 750000, 1000000, 2000000,
+    ]
+    CARDS_PER_PAGE = 20
+    # Aim each band at this share of the max_pages ceiling so most bands
+    # finish in one walk and only dense ones need a further split.
+    BAND_FILL_RATIO = 0.6
+    # Result pages are retried in place per PAGE_POLICIES; a price window
+    # whose page still fails is walked again from where it stopped up to
+    # this many times before the collection is marked incomplete.
+    WINDOW_RETRIES = 2
+    # Keep-alive connections kept open; matches the sharded walk's default workers
+    POOL_SIZE = 8
+
+    def __init__(self, limiter=None, metrics=None, session=None):
+        # Optional AdaptiveLimiter shared with the detail scraper, so a 429
+        # on either side slows down all requests to the site
+        self.limiter = limiter
+        # Optional Metrics: results page timings, statuses and link counts
+        self.metrics = metrics
+        # One session for all threads (see transport.make_session); it can be
+        # shared with the detail scraper, as both talk to the same site
+        self.session = session or make_session(self.HEADERS, self.POOL_SIZE, metrics)
+        # Failed result pages; a collection with errors may be incomplete
+        self.errors = 0
+
+    def _get_session(self):
+        return self.session
+
+    def _get(self, session, url):
+        """GET a results page with retries; raises FetchError if it keeps failing."""
+        def request():
+            start = time.perf_counter()
+            try:
+                resp = session.get(url)
+            except Exception:
+                if self.metrics:
+                    self.metrics.response(None)
+                raise
+            if self.metrics:
+                self.metrics.observe("results", time.perf_counter() - start)
+                self.metrics.response(resp.status_code, len(resp.content), resp.raw.tell())
+            return resp
+
+        def get():
+            resp = self.limiter.call(request) if self.limiter else request()
+            resp.raise_for_status()
+            return resp
+
+        return call_with_retry(get, url, PAGE_POLICIES)
+
+    def _build_url(self, min_price, page=1, max_price=None):
+        url = (
+            f"{self.BASE_URL}"
+            f"&{self.PRICE_FROM_PARAM}={min_price}"
+            f"&{self.SORT_PARAM}={self.SORT_VALUE}"
+            f"&{self.SORT_DIRECTION_PARAM}={self.SORT_DIRECTION_VALUE}"
+        )
+        if max_price is not None:
+            url += f"&{self.PRICE_TO_PARAM}={max_price}"
+        if page > 1:
+            url += f"&page={page}"
+        return url
+
+    def _card_price(self, card):
+        price_elem = card.select_one(self.PRICE_SELECTOR)
+        if price_elem:
+            digits = re.sub(r"[^\d]", "", price_elem.get_text(strip=True))
+            if digits:
+                return int(digits)
+        return None
 
     def _has_next_page(self, soup):
         """Return True if a 'next' button exists."""
@@ -34,91 +112,402 @@ class LinkCollector:
         )
         return next_btn is not None
 
-    def fetch_batch(self, min_price, limit=None, max_pages=50):
+    def fetch_batch(self, min_price, limit=None, max_pages=50, max_price=None):
         """
         Fetch links starting from min_price, up to 'limit' links (if given).
-        Returns (list_of_links, last_price).
+        Returns (list_of_links, last_price). If a page keeps failing, the
+        links before it are returned and self.errors is incremented.
         """
-        batch_links = []
+        batch_cards, last_price, _, error = self._walk_pages(
+            min_price, limit=limit, max_pages=max_pages, max_price=max_price
+        )
+        if error:
+            self.errors += 1
+        return [link for link, _ in batch_cards], last_price
+
+    def _iter_pages(self, min_price, max_pages=50, max_price=None, start_page=1):
+        """
+        Yield (page_cards, last_price, has_next) for each results page of one
+        price window, as soon as the page has been parsed. page_cards is a
+        list of (link, card_price) tuples; card_price may be None. Raises
+        FetchError if a page still fails after its retries.
+        """
+        page = start_page
         last_price = None
-        page = 1
+        session = self._get_session()
 
         while page <= max_pages:
-            url = (
-                f"{self.BASE_URL}"
-                f"&{self.PRICE_FROM_PARAM}={min_price}"
-                f"&{self.SORT_PARAM}={self.SORT_VALUE}"
-                f"&{self.SORT_DIRECTION_PARAM}={self.SORT_DIRECTION_VALUE}"
-            )
-            if page > 1:
-                url += f"&page={page}"
-
-            try:
-                resp = self.session.get(url)
-                resp.raise_for_status()
-            except Exception as e:
-                print(f"Batch error (min_price={min_price}, page={page}): {e}")
-                break
+            url = self._build_url(min_price, page, max_price)
 
+            resp = self._get(session, url)
             soup = BeautifulSoup(resp.text, "html.parser")
             cards = soup.select(self.CARD_SELECTOR)
             if not cards:
-                break
+                return
 
-            page_links = []
+            page_cards = []
             for card in cards:
                 link = card.get(self.LINK_ATTR)
                 if link and self.PROJECT_EXCLUDE not in link:
-                    price_elem = card.select_one(self.PRICE_SELECTOR)
-                    if price_elem:
-                        digits = re.sub(r"[^\d]", "", price_elem.get_text(strip=True))
-                        if digits:
-                            last_price = int(digits)
-                    page_links.append(link)
-
-            batch_links.extend(page_links)
-
-            # Stop if we've reached the limit
-            if limit and len(batch_links) >= limit:
-                batch_links = batch_links[:limit]
-                break
+                    price = self._card_price(card)
+                    if price is not None:
+                        last_price = price
+                    page_cards.append((link, price))
+
+            has_next = self._has_next_page(soup)
+            if self.metrics:
+                self.metrics.count("results_pages")
+                self.metrics.count("links_collected", len(page_cards))
+            yield page_cards, last_price, has_next
 
             # Stop if no next page
-            if not self._has_next_page(soup):
-                break
+            if not has_next:
+                return
 
             page += 1
 
-        return batch_links, last_price
+    def _walk_pages(self, min_price, limit=None, max_pages=50, max_price=None):
+        """
+        Walk result pages for one price window.
+        Returns (list_of_cards, last_price, truncated, error) where truncated
+        is True when the walk stopped at max_pages while more pages were
+        available, and error is the FetchError that cut the walk short.
+        """
+        batch_cards = []
+        last_price = None
+        truncated = False
+
+        pages = self._iter_pages(min_price, max_pages=max_pages, max_price=max_price)
+        try:
+            for page, (page_cards, last_price, has_next) in enumerate(pages, start=1):
+                batch_cards.extend(page_cards)
 
-    def fetch_all_links_dynamic(self, max_links=None):
+                # Stop if we've reached the limit
+                if limit and len(batch_cards) >= limit:
+                    batch_cards = batch_cards[:limit]
+                    break
+
+                truncated = has_next and page == max_pages
+        except FetchError as e:
+            print(f"Batch error (min_price={min_price}, max_price={max_price}): {e}")
+            return batch_cards, last_price, True, e
+
+        return batch_cards, last_price, truncated, None
+
+    def iter_cards_dynamic(self, max_links=None, checkpoint=None, max_pages=50, seen=None):
         """
-        Collect all property links, optionally stopping after max_links.
+        Yield (link, card_price) page by page using the same price batching as
+        fetch_all_links_dynamic, so consumers can start before collection ends.
+        Each batch restarts at the last price of the previous one, so listings
+        sharing that price are not lost; the ones already yielded are dropped
+        by listing ID via 'seen' (a ListingIds, created if not given).
+        With a Checkpoint, cards from earlier runs are replayed first and
+        collection continues from the saved cursor.
         """
-        all_links = []
+        seen = seen if seen is not None else ListingIds()
+        collected = 0
         min_price = 0
         batch = 1
+        start_page = 1
+        carried_price = None
+        window_retries = 0
+
+        if checkpoint is not None:
+            for link, price in checkpoint.journaled_cards():
+                if max_links and collected >= max_links:
+                    return
+                if seen.add(link):
+                    collected += 1
+                    yield link, price
+            cursor = checkpoint.cursor
+            if cursor and cursor.get("mode") == "dynamic":
+                if cursor["min_price"] is None:
+                    return
+                min_price = cursor["min_price"]
+                start_page = cursor["page"]
+                batch = cursor["batch"]
+                carried_price = cursor["last_price"]
 
         while True:
-            remaining = max_links - len(all_links) if max_links else None
+            remaining = max_links - collected if max_links else None
             print(f"\n=== Batch {batch} | min_price={min_price} | need {remaining if remaining else 'unlimited'} ===")
 
-            links, last_price = self.fetch_batch(min_price, limit=remaining)
-            all_links.extend(links)
-            print(f"Collected {len(links)} links this batch. Total: {len(all_links)}")
+            batch_count = 0
+            last_price = carried_price
+            page = start_page - 1
+            truncated = False
+            error = None
+            pages = self._iter_pages(min_price, max_pages=max_pages, start_page=start_page)
+            try:
+                for page, (page_cards, page_price, has_next) in enumerate(pages, start=start_page):
+                    if page_price is not None:
+                        last_price = page_price
+                    page_cards = [card for card in page_cards if seen.add(card[0])]
+                    if max_links:
+                        page_cards = page_cards[:max_links - collected]
+                    batch_count += len(page_cards)
+                    collected += len(page_cards)
+                    truncated = has_next and page == max_pages
 
-            if not links:
-                break
+                    if checkpoint is not None:
+                        if has_next and page < max_pages:
+                            cursor = {"min_price": min_price, "page": page + 1,
+                                      "batch": batch, "last_price": last_price}
+                        elif truncated and last_price is not None:
+                            cursor = {"min_price": self._next_min_price(min_price, last_price),
+                                      "page": 1, "batch": batch + 1, "last_price": None}
+                        else:
+                            # Nothing priced above this window: collection is complete
+                            cursor = {"min_price": None, "page": 1,
+                                      "batch": batch + 1, "last_price": None}
+                        checkpoint.save_cards(page_cards, dict(cursor, mode="dynamic"))
+
+                    yield from page_cards
+                    if max_links and collected >= max_links:
+                        break
+            except FetchError as e:
+                print(f"Batch error (min_price={min_price}, page={page + 1}): {e}")
+                error = e
+            print(f"Collected {batch_count} new links this batch. Total: {collected}")
 
-            if max_links and len(all_links) >= max_links:
-                # Trim if we overshot (shouldn't happen, but safe)
-                all_links = all_links[:max_links]
+            if error:
+                if window_retries < self.WINDOW_RETRIES:
+                    # Walk the window again from the page that failed
+                    window_retries += 1
+                    start_page = page + 1
+                    carried_price = last_price
+                    continue
+                self.errors += 1
+                if last_price is None:
+                    raise error
+                # Later pages of the window are covered by the next batch,
+                # which starts from the last price that was reached
+                print(f"Skipping the rest of batch {batch} after repeated errors")
+            window_retries = 0
+
+            if max_links and collected >= max_links:
                 break
 
-            if last_price is None:
+            # Only a window cut off by the page ceiling (or an error) has more
+            # listings above it; otherwise the catalogue has been walked.
+            if not (truncated or error) or last_price is None:
                 break
 
-            min_price = last_price + 1
+            min_price = self._next_min_price(min_price, last_price)
             batch += 1
+            start_page = 1
+            carried_price = None
+
+    @staticmethod
+    def _next_min_price(min_price, last_price):
+        # Restart inclusively at last_price; a window that never left
+        # min_price has to step past it to make progress.
+        return last_price if last_price > min_price else last_price + 1
+
+    def iter_links_dynamic(self, max_links=None):
+        """Yield property links page by page (see iter_cards_dynamic)."""
+        for link, _ in self.iter_cards_dynamic(max_links=max_links):
+            yield link
+
+    def fetch_all_links_dynamic(self, max_links=None):
+        """
+        Collect all property links, optionally stopping after max_links.
+        """
+        return list(self.iter_links_dynamic(max_links=max_links))
+
+    def probe_density(self, prices=None):
+        """
+        Fetch only the first results page at each probe price and estimate
+        listings per euro from the price span covered by that page.
+        Returns a list of (price, density) tuples sorted by price.
+        """
+        prices = sorted(set(prices or self.PROBE_PRICES))
+        session = self._get_session()
+        samples = []
+
+        for price in prices:
+            try:
+                resp = self._get(session, self._build_url(price))
+                resp.raise_for_status()
+            except Exception as e:
+                print(f"Probe error (min_price={price}): {e}")
+                continue
+
+            soup = BeautifulSoup(resp.text, "html.parser")
+            card_prices = [
+                p for p in (self._card_price(c) for c in soup.select(self.CARD_SELECTOR))
+                if p is not None
+            ]
+            if not card_prices:
+                samples.append((price, 0.0))
+                continue
+
+            span = max(card_prices) - min(card_prices)
+            samples.append((price, len(card_prices) / max(span, 1)))
+
+        return samples
+
+    def plan_price_bands(self, samples, max_pages=50):
+        """
+        Turn density samples into disjoint (min_price, max_price) bands, each
+        expected to fit under the max_pages ceiling. The last band is open-ended.
+        """
+        target = max(1, int(max_pages * self.CARDS_PER_PAGE * self.BAND_FILL_RATIO))
+        if not samples:
+            return [(0, None)]
+
+        bands = []
+        band_start = samples[0][0]
+        band_count = 0.0
+
+        for (lo, density), (hi, _) in zip(samples, samples[1:]):
+            estimate = density * (hi - lo)
+            if estimate > target:
+                # Dense interval: close the pending band, then cut this
+                # interval into equal-width pieces.
+                if lo > band_start:
+                    bands.append((band_start, lo - 1))
+                pieces = math.ceil(estimate / target)
+                width = max(1, (hi - lo) // pieces)
+                start = lo
+                while start + width < hi:
+                    bands.append((start, start + width - 1))
+                    start += width
+                band_start, band_count = start, 0.0
+                continue
+
+            if band_count + estimate > target and hi > band_start:
+                bands.append((band_start, lo - 1))
+                band_start, band_count = lo, 0.0
+            band_count += estimate
+
+        bands.append((band_start, None))
+        return [(lo, hi) for lo, hi in bands if hi is None or hi >= lo]
 
-        return all_links
\ No newline at end of file
+    def walk_band(self, min_price, max_price, max_pages=50):
+        """
+        Walk one price band. Returns (cards, remainder, error): the band's
+        (link, card_price) pairs, the (min_price, max_price) still to walk
+        when the page ceiling or an error cut the walk short (else None),
+        and the FetchError that stopped it, if any.
+        """
+        cards, last_price, truncated, error = self._walk_pages(
+            min_price, max_pages=max_pages, max_price=max_price
+        )
+        remainder = None
+        if error:
+            # Walk the rest of the band again, from the last price reached
+            remainder = (last_price if last_price is not None else min_price, max_price)
+        elif truncated and last_price is not None:
+            # Duplicates at the boundary are dropped by the caller
+            resume = self._next_min_price(min_price, last_price)
+            if max_price is None or resume <= max_price:
+                remainder = (resume, max_price)
+        return cards, remainder, error
+
+    def split_band(self, min_price, max_price):
+        """Split a band that hit the page ceiling into two halves."""
+        if max_price is not None and max_price <= min_price:
+            return [(min_price, max_price)]
+        if max_price is None:
+            # Open-ended tail: peel off a finite band the width of min_price.
+            mid = max(min_price * 2, min_price + 1000)
+            return [(min_price, mid), (mid + 1, None)]
+        mid = (min_price + max_price) // 2
+        return [(min_price, mid), (mid + 1, max_price)]
+
+    def iter_cards_sharded(self, max_links=None, max_workers=8, max_pages=50, checkpoint=None,
+                           seen=None):
+        """
+        Yield (link, card_price) from disjoint price bands walked in parallel.
+        Bands are sized from a density probe; a band that reaches the max_pages
+        ceiling has its unwalked remainder split and re-queued. Links are
+        yielded as each band completes, once per listing ID (see
+        iter_cards_dynamic for 'seen'). With a Checkpoint, cards from earlier
+        runs are replayed and only the bands still pending are walked.
+        """
+        seen = seen if seen is not None else ListingIds()
+        collected = 0
+        bands = None
+        band_retries = {}
+
+        if checkpoint is not None:
+            for link, price in checkpoint.journaled_cards():
+                if max_links and collected >= max_links:
+                    return
+                if seen.add(link):
+                    collected += 1
+                    yield link, price
+            cursor = checkpoint.cursor
+            if cursor and cursor.get("mode") == "sharded":
+                bands = [tuple(band) for band in cursor["bands"]]
+                print(f"Resuming {len(bands)} pending price bands")
+
+        if bands is None:
+            print("Probing listing density...")
+            bands = self.plan_price_bands(self.probe_density(), max_pages=max_pages)
+            print(f"Planned {len(bands)} price bands")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {
+                executor.submit(self.walk_band, lo, hi, max_pages): (lo, hi)
+                for lo, hi in bands
+            }
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    lo, hi = pending.pop(future)
+                    cards, remainder, error = future.result()
+
+                    new_cards = []
+                    for link, price in cards:
+                        if max_links and collected >= max_links:
+                            break
+                        if seen.add(link):
+                            collected += 1
+                            new_cards.append((link, price))
+                    print(f"Band {lo}-{hi if hi is not None else 'max'}: "
+                          f"{len(new_cards)} links. Total: {collected}")
+
+                    if error:
+                        retries = band_retries.get((lo, hi), 0) + 1
+                        if retries <= self.WINDOW_RETRIES:
+                            sub = executor.submit(self.walk_band, *remainder, max_pages)
+                            pending[sub] = remainder
+                            band_retries[remainder] = retries
+                        else:
+                            print(f"Giving up on band {remainder[0]}-{hi if hi is not None else 'max'}")
+                            self.errors += 1
+                    elif remainder:
+                        for sub_lo, sub_hi in self.split_band(*remainder):
+                            sub = executor.submit(self.walk_band, sub_lo, sub_hi, max_pages)
+                            pending[sub] = (sub_lo, sub_hi)
+
+                    if checkpoint is not None:
+                        checkpoint.save_cards(new_cards, {
+                            "mode": "sharded",
+                            "bands": [list(band) for band in pending.values()],
+                        })
+
+                    yield from new_cards
+
+                if max_links and collected >= max_links:
+                    for future in pending:
+                        future.cancel()
+                    break
+
+    def iter_links_sharded(self, max_links=None, max_workers=8, max_pages=50):
+        """Yield property links from parallel price bands (see iter_cards_sharded)."""
+        for link, _ in self.iter_cards_sharded(
+            max_links=max_links, max_workers=max_workers, max_pages=max_pages
+        ):
+            yield link
+
+    def fetch_all_links_sharded(self, max_links=None, max_workers=8, max_pages=50):
+        """
+        Collect all property links by walking disjoint price bands in parallel.
+        """
+        return list(self.iter_links_sharded(
+            max_links=max_links, max_workers=max_workers, max_pages=max_pages
+        ))
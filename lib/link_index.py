@@ -0,0 +1,199 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+from lib.listing_ids import listing_id
+
+
+class LinkIndex:
+    """
+    Persistent index of known listing links for incremental crawls.
+
+    For every link the index keeps the price last seen on its search-result
+    card, the card price at the time its details were last scraped, and
+    whether it is still listed. A crawl only needs detail pages for links
+    that are new, relisted, or whose card price moved since their last scrape.
+    Listings are matched by listing ID, so a link whose slug changed (e.g.
+    a new locality or subtype) keeps its history instead of showing up as
+    one new and one delisted listing.
+    """
+
+    ACTIVE = "active"
+    GONE = "gone"
+
+    def __init__(self, path="src/link_index.sqlite"):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS links (
+                link TEXT PRIMARY KEY,
+                price INTEGER,
+                scraped_price INTEGER,
+                scraped INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen_run INTEGER NOT NULL,
+                listing_id TEXT,
+                scraped_at REAL
+            )
+            """
+        )
+        self._migrate()
+        self.conn.execute("CREATE INDEX IF NOT EXISTS links_listing_id ON links (listing_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY, started REAL)")
+        self.conn.commit()
+        self.run = None
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+
+    def _migrate(self):
+        # Indexes created before links were keyed on listing ID, or before
+        # scrape times were kept (their records count as the stalest)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(links)")]
+        if "listing_id" not in columns:
+            self.conn.execute("ALTER TABLE links ADD COLUMN listing_id TEXT")
+        if "scraped_at" not in columns:
+            self.conn.execute("ALTER TABLE links ADD COLUMN scraped_at REAL")
+        links = [row[0] for row in self.conn.execute(
+            "SELECT link FROM links WHERE listing_id IS NULL"
+        )]
+        self.conn.executemany(
+            "UPDATE links SET listing_id = ? WHERE link = ?",
+            [(listing_id(link), link) for link in links],
+        )
+
+    def begin_run(self):
+        """Start a crawl; links not observed before finish_run become delisted."""
+        with self.lock:
+            cur = self.conn.execute("INSERT INTO runs (started) VALUES (?)", (time.time(),))
+            self.conn.commit()
+            self.run = cur.lastrowid
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+        return self.run
+
+    def observe(self, link, price):
+        """
+        Record that link was listed with the given card price in this run.
+        Returns "new" for a listing that was never scraped, "changed" if it
+        was delisted, moved to another link or changed price since its last
+        scrape, else "unchanged".
+        """
+        lid = listing_id(link)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT link, scraped_price, scraped, status FROM links WHERE link = ?", (link,)
+            ).fetchone()
+            if row is None:
+                # Same listing under a new link
+                row = self.conn.execute(
+                    "SELECT link, scraped_price, scraped, status FROM links "
+                    "WHERE listing_id = ? ORDER BY last_seen_run DESC LIMIT 1",
+                    (lid,),
+                ).fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO links (link, price, status, first_seen, last_seen_run, listing_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (link, price, self.ACTIVE, time.time(), self.run, lid),
+                )
+                state = "new"
+            else:
+                known_link, scraped_price, scraped, status = row
+                self.conn.execute(
+                    "UPDATE links SET link = ?, price = ?, status = ?, last_seen_run = ? "
+                    "WHERE link = ?",
+                    (link, price, self.ACTIVE, self.run, known_link),
+                )
+                # A new link means the slug (locality, subtype...) changed too
+                if not scraped:
+                    state = "new"
+                elif status == self.GONE or scraped_price != price or known_link != link:
+                    state = "changed"
+                else:
+                    state = "unchanged"
+        self.counts[state] += 1
+        return state
+
+    def observe_cards(self, cards):
+        """Observe (link, card_price) pairs and yield each as (link, card_price, state)."""
+        for i, (link, price) in enumerate(cards, start=1):
+            yield link, price, self.observe(link, price)
+            if i % 1000 == 0:
+                self.commit()
+        self.commit()
+
+    def filter_changed(self, cards):
+        """Observe (link, card_price) pairs and yield the links that need scraping."""
+        for link, _, state in self.observe_cards(cards):
+            if state != "unchanged":
+                yield link
+
+    def mark_scraped(self, record):
+        """Remember the card price a link had when its details were scraped."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE links SET scraped = 1, scraped_price = price, scraped_at = ? "
+                "WHERE link = ?",
+                (time.time(), record["Link"]),
+            )
+
+    def scraped_at(self, link):
+        """When the details of link were last scraped (epoch seconds), or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT scraped_at FROM links WHERE link = ?", (link,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def finish_run(self):
+        """
+        Mark every active link that was not observed in this run as delisted.
+        Only call this after a complete collection. Returns the delisted links.
+        """
+        with self.lock:
+            gone = [
+                row[0] for row in self.conn.execute(
+                    "SELECT link FROM links WHERE status = ? AND last_seen_run != ?",
+                    (self.ACTIVE, self.run),
+                )
+            ]
+            self.conn.execute(
+                "UPDATE links SET status = ? WHERE status = ? AND last_seen_run != ?",
+                (self.GONE, self.ACTIVE, self.run),
+            )
+            self.conn.commit()
+        return gone
+
+    def export_delisted(self, links, filename):
+        """Append delisted links to a CSV file (creates file with header if needed)."""
+        if not links:
+            return
+        file_exists = os.path.exists(filename)
+        with open(filename, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if not file_exists:
+                writer.writerow(["Link", "Delisted run"])
+            for link in links:
+                writer.writerow([link, self.run])
+        print(f"Appended {len(links)} delisted links to {filename}")
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def stats(self):
+        return (f"link index: {self.counts['new']} new, {self.counts['changed']} changed, "
+                f"{self.counts['unchanged']} unchanged")
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
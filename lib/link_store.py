@@ -0,0 +1,331 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+from lib.link_index import LinkIndex
+from lib.listing_ids import listing_id, listing_key
+
+
+class LinkStore:
+    """
+    Memory-mapped store of every listing link ever collected.
+
+    The index file is a hash table of fixed-width slots keyed by the listing
+    ID packed into 8 bytes (listing_ids.listing_key). A slot holds where the
+    link's text sits in the links file, status flags, the card price, the
+    card price at the last scrape, when that scrape was and the last run the
+    listing was seen in. A lookup hashes straight to its slot in the mapped
+    file and iteration unpacks slots in place, so nothing is loaded up front.
+    A listing costs a 44-byte slot (up to twice that with the table's free
+    slots) plus its link text. Writes land in the page cache at once, so a
+    killed process loses nothing.
+
+    It has the methods of LinkIndex, and its add() makes it usable as the
+    collector's 'seen' set, which then needs no memory of its own.
+    """
+
+    # Status flags; a listing that was never scraped has none of them
+    NEW = 0
+    SCRAPED = 1
+    FAILED = 2
+    DELISTED = 4
+
+    MAGIC = b"LNKS"
+    VERSION = 2
+    # magic, version, capacity, listings, run
+    HEADER = struct.Struct("<4sIQQI")
+    HEADER_SIZE = 64
+    # key, text offset, text length, flags, price, scraped price, seen run, scraped at
+    SLOT = struct.Struct("<qQHBxqqII")
+    # Version 1 stored prices as int32
+    SLOT_V1 = struct.Struct("<qQHBxiiII")
+    PRICE_MAX = 2 ** 63 - 1
+    KEY = struct.Struct("<q")
+
+    INITIAL_CAPACITY = 1 << 16
+    # The table doubles before probes get long
+    MAX_LOAD = 0.7
+
+    def __init__(self, path="src/links"):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.index_path = path + ".idx"
+        self.lock = threading.Lock()
+        # Unbuffered, so link text is on disk before a slot points at it
+        self.text_file = open(path + ".links", "a+b", buffering=0)
+        self.text_end = self.text_file.seek(0, os.SEEK_END)
+        self.text = None
+        if not os.path.exists(self.index_path):
+            self._create(self.index_path, self.INITIAL_CAPACITY, 0, 0)
+        self._open_index()
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+
+    def _create(self, path, capacity, count, run):
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, capacity, count, run)
+                    .ljust(self.HEADER_SIZE, b"\0"))
+            f.truncate(self.HEADER_SIZE + capacity * self.SLOT.size)
+
+    def _open_index(self):
+        self.index_file = open(self.index_path, "r+b")
+        self.index = mmap.mmap(self.index_file.fileno(), 0)
+        magic, version, capacity, count, run = self.HEADER.unpack_from(self.index, 0)
+        if magic != self.MAGIC or version not in (1, self.VERSION):
+            raise ValueError(f"{self.index_path} is not a link store index")
+        self.capacity, self.count, self.run = capacity, count, run
+        if version == 1:
+            self._upgrade_v1()
+
+    def _upgrade_v1(self):
+        """Rewrite a version 1 index with the wider price fields."""
+        tmp_path = self.index_path + ".tmp"
+        self._create(tmp_path, self.capacity, self.count, self.run)
+        with open(tmp_path, "r+b") as f, mmap.mmap(f.fileno(), 0) as upgraded:
+            for i in range(self.capacity):
+                slot = self.SLOT_V1.unpack_from(self.index, self.HEADER_SIZE + i * self.SLOT_V1.size)
+                if slot[0]:
+                    self.SLOT.pack_into(upgraded, self.HEADER_SIZE + i * self.SLOT.size, *slot)
+            upgraded.flush()
+        self._close_index()
+        os.replace(tmp_path, self.index_path)
+        self._open_index()
+
+    def _close_index(self):
+        self.index.close()
+        self.index_file.close()
+
+    def _write_header(self):
+        self.HEADER.pack_into(self.index, 0, self.MAGIC, self.VERSION,
+                              self.capacity, self.count, self.run)
+
+    def _find(self, index, capacity, key):
+        """(slot number, found) for key: its slot, or the empty one it would take."""
+        mask = capacity - 1
+        # Fibonacci hashing spreads the packed IDs, which are mostly sequential
+        i = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - capacity.bit_length() + 1)
+        while True:
+            at = self.HEADER_SIZE + i * self.SLOT.size
+            slot_key = self.KEY.unpack_from(index, at)[0]
+            if slot_key == key:
+                return i, True
+            if slot_key == 0:
+                return i, False
+            i = (i + 1) & mask
+
+    def _read(self, i):
+        return list(self.SLOT.unpack_from(self.index, self.HEADER_SIZE + i * self.SLOT.size))
+
+    def _write(self, i, slot):
+        self.SLOT.pack_into(self.index, self.HEADER_SIZE + i * self.SLOT.size, *slot)
+
+    def _grow(self):
+        """Rehash every slot into a table twice the size."""
+        capacity = self.capacity * 2
+        tmp_path = self.index_path + ".tmp"
+        self._create(tmp_path, capacity, self.count, self.run)
+        with open(tmp_path, "r+b") as f, mmap.mmap(f.fileno(), 0) as grown:
+            for i in range(self.capacity):
+                at = self.HEADER_SIZE + i * self.SLOT.size
+                key = self.KEY.unpack_from(self.index, at)[0]
+                if key:
+                    j, _ = self._find(grown, capacity, key)
+                    to = self.HEADER_SIZE + j * self.SLOT.size
+                    grown[to:to + self.SLOT.size] = self.index[at:at + self.SLOT.size]
+            grown.flush()
+        self._close_index()
+        os.replace(tmp_path, self.index_path)
+        self._open_index()
+
+    def _append_text(self, link):
+        data = link.encode()
+        self.text_file.write(data + b"\n")
+        offset = self.text_end
+        self.text_end += len(data) + 1
+        return offset, len(data)
+
+    def _link(self, offset, length):
+        if self.text is None or offset + length > len(self.text):
+            # Map again to cover text appended since the last mapping
+            if self.text is not None:
+                self.text.close()
+            self.text = mmap.mmap(self.text_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.text[offset:offset + length].decode()
+
+    def _insert(self, link, key, price):
+        if self.count + 1 > self.capacity * self.MAX_LOAD:
+            self._grow()
+        i, _ = self._find(self.index, self.capacity, key)
+        offset, length = self._append_text(link)
+        self._write(i, [key, offset, length, self.NEW, price, -1, self.run, 0])
+        self.count += 1
+        self._write_header()
+
+    @classmethod
+    def _price(cls, price):
+        # Prices are stored as int64, -1 for a card without one. A card
+        # whose digits run together (e.g. a price range) can exceed even
+        # that and counts as having no price.
+        if price is None:
+            return -1
+        price = int(price)
+        return price if 0 <= price <= cls.PRICE_MAX else -1
+
+    def begin_run(self):
+        """Start a crawl; listings not seen before finish_run become delisted."""
+        with self.lock:
+            self.run += 1
+            self._write_header()
+            self.index.flush()
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+        return self.run
+
+    def add(self, link):
+        """
+        Mark the listing of link as seen in this run, storing it if it is
+        unknown. Returns False if it was already seen in this run, like
+        ListingIds.add.
+        """
+        key = listing_key(listing_id(link))
+        with self.lock:
+            i, found = self._find(self.index, self.capacity, key)
+            if not found:
+                self._insert(link, key, -1)
+                return True
+            slot = self._read(i)
+            if slot[6] == self.run:
+                return False
+            slot[6] = self.run
+            self._write(i, slot)
+            return True
+
+    def __contains__(self, link):
+        key = listing_key(listing_id(link))
+        with self.lock:
+            return self._find(self.index, self.capacity, key)[1]
+
+    def observe(self, link, price):
+        """
+        Record that link was listed with the given card price in this run.
+        Returns "new" for a listing that was never scraped, "changed" if it
+        was delisted, failed, moved to another link or changed price since
+        its last scrape, else "unchanged".
+        """
+        key = listing_key(listing_id(link))
+        price = self._price(price)
+        with self.lock:
+            i, found = self._find(self.index, self.capacity, key)
+            if not found:
+                self._insert(link, key, price)
+                state = "new"
+            else:
+                _, offset, length, flags, _, scraped_price, _, scraped_at = self._read(i)
+                moved = self._link(offset, length) != link
+                if moved:
+                    offset, length = self._append_text(link)
+                if not flags & self.SCRAPED:
+                    state = "new"
+                elif (flags & (self.DELISTED | self.FAILED) or scraped_price != price
+                        or moved):
+                    state = "changed"
+                else:
+                    state = "unchanged"
+                self._write(i, [key, offset, length, flags & ~self.DELISTED, price,
+                                scraped_price, self.run, scraped_at])
+        self.counts[state] += 1
+        return state
+
+    def observe_cards(self, cards):
+        """Observe (link, card_price) pairs and yield each as (link, card_price, state)."""
+        for link, price in cards:
+            yield link, price, self.observe(link, price)
+        self.commit()
+
+    def filter_changed(self, cards):
+        """Observe (link, card_price) pairs and yield the links that need scraping."""
+        for link, _, state in self.observe_cards(cards):
+            if state != "unchanged":
+                yield link
+
+    def _update(self, link, set_flags, clear_flags=0, scraped=False):
+        key = listing_key(listing_id(link))
+        with self.lock:
+            i, found = self._find(self.index, self.capacity, key)
+            if not found:
+                return
+            slot = self._read(i)
+            slot[3] = (slot[3] | set_flags) & ~clear_flags
+            if scraped:
+                slot[5] = slot[4]
+                slot[7] = int(time.time())
+            self._write(i, slot)
+
+    def mark_scraped(self, record):
+        """Remember the card price a link had when its details were scraped."""
+        self._update(record["Link"], self.SCRAPED, self.FAILED, scraped=True)
+
+    def mark_failed(self, link):
+        """Flag a link whose detail page could not be scraped; it is retried next run."""
+        self._update(link, self.FAILED)
+
+    def scraped_at(self, link):
+        """When the details of link were last scraped (epoch seconds), or None."""
+        key = listing_key(listing_id(link))
+        with self.lock:
+            i, found = self._find(self.index, self.capacity, key)
+            return (self._read(i)[7] or None) if found else None
+
+    def entries(self):
+        """
+        Yield (link, flags, price, scraped_price, scraped_at) for every
+        listing, read slot by slot from the mapped index. Prices are None
+        when unknown, scraped_at is 0 for a listing never scraped. Do not
+        add listings while iterating.
+        """
+        for i in range(self.capacity):
+            key, offset, length, flags, price, scraped_price, _, scraped_at = self._read(i)
+            if key:
+                yield (self._link(offset, length), flags,
+                       None if price == -1 else price,
+                       None if scraped_price == -1 else scraped_price, scraped_at)
+
+    def finish_run(self):
+        """
+        Mark every listing that was not seen in this run as delisted.
+        Only call this after a complete collection. Returns the delisted links.
+        """
+        gone = []
+        with self.lock:
+            for i in range(self.capacity):
+                slot = self._read(i)
+                if slot[0] and slot[6] != self.run and not slot[3] & self.DELISTED:
+                    slot[3] |= self.DELISTED
+                    self._write(i, slot)
+                    gone.append(self._link(slot[1], slot[2]))
+        self.commit()
+        return gone
+
+    # Same CSV as the SQLite index
+    export_delisted = LinkIndex.export_delisted
+
+    def commit(self):
+        """Flush the index to disk."""
+        with self.lock:
+            self._write_header()
+            self.index.flush()
+
+    def stats(self):
+        return (f"link store: {self.counts['new']} new, {self.counts['changed']} changed, "
+                f"{self.counts['unchanged']} unchanged, {self.count} listings known")
+
+    def close(self):
+        self.commit()
+        with self.lock:
+            if self.text is not None:
+                self.text.close()
+            self.text_file.close()
+            self._close_index()
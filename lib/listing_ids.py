@@ -0,0 +1,92 @@
+import bisect
+import hashlib
+import heapq
+import re
+from array import array
+
+
+# Detail links end in the listing ID, e.g. .../for-sale/4040/herstal/vbb80010
+_ID_PATTERN = re.compile(r"([a-z]{1,4})(\d{1,11})")
+
+
+def listing_id(link):
+    """The listing ID of a detail link (its last path segment, lowercased)."""
+    return link.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1].lower()
+
+
+def _encode(lid):
+    """Pack an ID like 'vbb80010' into one int (None if it has another shape)."""
+    match = _ID_PATTERN.fullmatch(lid)
+    if not match:
+        return None
+    letters, digits = match.groups()
+    prefix = 0
+    for ch in letters:
+        prefix = prefix * 27 + ord(ch) - 96
+    # The digit count keeps IDs with leading zeros apart (vwd01221 vs vwd1221)
+    return (prefix << 41) | (len(digits) << 37) | int(digits)
+
+
+def listing_key(lid):
+    """
+    64-bit key for a listing ID: its packed form, or for IDs of another
+    shape a hash of it with the sign bit set, so the two never overlap.
+    Never 0.
+    """
+    code = _encode(lid)
+    if code is not None:
+        return code
+    digest = hashlib.blake2b(lid.encode(), digest_size=8).digest()
+    return -(int.from_bytes(digest, "little") >> 1) - 1
+
+
+class ListingIds:
+    """
+    Set of listing IDs that stores each ID as 8 bytes.
+
+    IDs are packed into 64-bit ints and kept in a sorted array, with a small
+    set in front for recent additions that is merged into the array when it
+    grows. A set of link strings costs ~150 bytes per listing; this costs
+    ~14. IDs of an unexpected shape fall back to a plain set of strings.
+    """
+
+    MERGE_MIN = 4096
+
+    def __init__(self, links=()):
+        self._sorted = array("q")
+        self._recent = set()
+        self._other = set()
+        for link in links:
+            self.add(link)
+
+    def _has_code(self, code):
+        if code in self._recent:
+            return True
+        i = bisect.bisect_left(self._sorted, code)
+        return i < len(self._sorted) and self._sorted[i] == code
+
+    def __contains__(self, link):
+        lid = listing_id(link)
+        code = _encode(lid)
+        return lid in self._other if code is None else self._has_code(code)
+
+    def add(self, link):
+        """Add the listing of a link (or a bare ID); returns False if it was already present."""
+        lid = listing_id(link)
+        code = _encode(lid)
+        if code is None:
+            if lid in self._other:
+                return False
+            self._other.add(lid)
+            return True
+        if self._has_code(code):
+            return False
+        self._recent.add(code)
+        # Merge once the set is an eighth of the array, so merges stay amortised O(1)
+        if len(self._recent) >= max(self.MERGE_MIN, len(self._sorted) // 8):
+            self._sorted = array("q", heapq.merge(self._sorted, sorted(self._recent)))
+            self._recent.clear()
+        return True
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent) + len(self._other)
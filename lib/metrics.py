@@ -0,0 +1,339 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+
+# Upper bounds (seconds) of the stage timing histogram buckets
+BUCKETS = (
+    0.001, 0.002, 0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15,
+    0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Per-page stages, in the order a detail page goes through them:
+#   connect   DNS lookup, TCP and TLS setup (only when a new connection is opened)
+#   ttfb      request start until the response headers arrived (includes
+#             connect when the request had to open a connection)
+#   download  reading the response body
+#   parse     HTML -> tree
+#   extract   tree -> DETAILS_FIELDS record
+#   results   fetching one search-results page, end to end
+STAGES = ("connect", "ttfb", "download", "parse", "extract", "results")
+
+
+class Histogram:
+    """Prometheus-style histogram of durations in seconds."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and stage timings for one crawl.
+
+    Counters only go up (bytes received, pages, records); gauges hold the
+    latest value of something, either set directly or read from a callable
+    registered with track() (queue sizes, the rate limiter's limit).
+    snapshot() returns everything as a dict that can be written as a JSON
+    line or in the Prometheus text format.
+    """
+
+    PREFIX = "immovlan_scraper"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.counters = {}
+        self.statuses = {}
+        self.gauges = {}
+        self.tracked = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].observe(seconds)
+
+    def observe_all(self, timings):
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.stages[stage].observe(seconds)
+
+    def fetched(self, ttfb, download, status, size, wire=None):
+        """Record one fetched page: time to headers, body download time, status and sizes."""
+        with self.lock:
+            self.stages["ttfb"].observe(ttfb)
+            self.stages["download"].observe(download)
+        self.response(status, size, wire)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def response(self, status, size=0, wire=None):
+        """
+        Count one response by status code (None: no response), its decoded
+        body size and, when known, the body bytes that came over the network.
+        """
+        key = str(status) if status is not None else "error"
+        with self.lock:
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            self.counters["bytes_received"] = self.counters.get("bytes_received", 0) + size
+            if wire is not None:
+                self.counters["bytes_on_wire"] = self.counters.get("bytes_on_wire", 0) + wire
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def track(self, name, read):
+        """Read gauge 'name' from read() whenever a snapshot is taken."""
+        with self.lock:
+            self.tracked[name] = read
+
+    def snapshot(self):
+        with self.lock:
+            gauges = dict(self.gauges)
+            for name, read in self.tracked.items():
+                gauges[name] = read()
+            return {
+                "time": round(time.time(), 3),
+                "elapsed": round(time.time() - self.started, 3),
+                "counters": dict(self.counters),
+                "statuses": dict(self.statuses),
+                "gauges": gauges,
+                "stages": {name: h.snapshot() for name, h in self.stages.items()},
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            gauges = dict(self.gauges)
+            for name, read in self.tracked.items():
+                gauges[name] = read()
+
+            name = f"{self.PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, h in self.stages.items():
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+            name = f"{self.PREFIX}_responses_total"
+            lines.append(f"# TYPE {name} counter")
+            for status, count in sorted(self.statuses.items()):
+                lines.append(f'{name}{{status="{status}"}} {count}')
+
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {self.PREFIX}_{counter}_total counter")
+                lines.append(f"{self.PREFIX}_{counter}_total {value}")
+            for gauge, value in sorted(gauges.items()):
+                lines.append(f"# TYPE {self.PREFIX}_{gauge} gauge")
+                lines.append(f"{self.PREFIX}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        Write the current metrics to path: a ".jsonl" file gets one JSON
+        snapshot appended per call; anything else is replaced with the
+        Prometheus text format (e.g. for the node_exporter textfile collector).
+        """
+        if path.endswith(".jsonl"):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def transport_stats(self):
+        """Compression and keep-alive summary: bytes on the wire and connection reuse."""
+        with self.lock:
+            received = self.counters.get("bytes_received", 0)
+            wire = self.counters.get("bytes_on_wire", received)
+            opened = self.counters.get("connections_opened", 0)
+            requests = sum(count for status, count in self.statuses.items() if status != "error")
+        ratio = f" ({wire / received:.0%})" if received else ""
+        reuse = f" ({1 - opened / requests:.1%} reused)" if requests else ""
+        return (f"transport: {wire / 1e6:.1f} MB on the wire for {received / 1e6:.1f} MB of pages"
+                f"{ratio}, {opened} connections for {requests} requests{reuse}")
+
+    # --- HTTP clients -------------------------------------------------------
+
+    def adapter(self, **kwargs):
+        """
+        requests adapter that reports connection setup time and count to this
+        object; kwargs (e.g. pool_maxsize) go to HTTPAdapter.
+        """
+        return TimedAdapter(self, **kwargs)
+
+    def httpx_trace(self, timings):
+        """
+        httpx 'trace' extension for one request: fills 'timings' with the
+        perf_counter times at which the request started (connecting or
+        sending), the connection was ready and the response headers arrived,
+        and records the connection setup time.
+        """
+        async def trace(event, info):
+            now = time.perf_counter()
+            if event == "connection.connect_tcp.started":
+                timings.setdefault("start", now)
+                timings["connect"] = now
+                self.count("connections_opened")
+            elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                timings["connected"] = now
+            elif event.endswith("send_request_headers.started"):
+                timings.setdefault("start", now)
+                if "connect" in timings and "connected" in timings:
+                    self.observe("connect", timings["connected"] - timings["connect"])
+            elif event.endswith("receive_response_headers.complete"):
+                timings["headers"] = now
+        return trace
+
+
+def _timed_connection(base, metrics):
+    class TimedConnection(base):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                metrics.observe("connect", time.perf_counter() - start)
+                metrics.count("connections_opened")
+    return TimedConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report their DNS/TCP/TLS setup time."""
+
+    def __init__(self, metrics, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: type(pool.__name__, (pool,), {
+                "ConnectionCls": _timed_connection(pool.ConnectionCls, self.metrics)
+            })
+            for scheme, pool in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class MetricsReporter:
+    """
+    Background thread that prints a progress line with rate and ETA every
+    'interval' seconds and, with a path, exports the metrics each time.
+    """
+
+    def __init__(self, metrics, interval=5.0, path=None):
+        self.metrics = metrics
+        self.interval = interval
+        self.path = path
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._last = (time.time(), 0)
+        self._rate = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        print(self.progress_line(final=True))
+        print(self.metrics.transport_stats())
+        if self.path:
+            self.metrics.export(self.path)
+            print(f"Metrics written to {self.path}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.progress_line())
+            if self.path:
+                self.metrics.export(self.path)
+
+    def progress_line(self, final=False):
+        snap = self.metrics.snapshot()
+        counters, gauges, stages = snap["counters"], snap["gauges"], snap["stages"]
+        done = counters.get("details_scraped", 0) + counters.get("details_failed", 0)
+
+        # Smoothed detail pages/sec since the previous line
+        now = time.time()
+        last_time, last_done = self._last
+        if now > last_time:
+            rate = (done - last_done) / (now - last_time)
+            self._rate = rate if self._rate is None else 0.3 * rate + 0.7 * self._rate
+        self._last = (now, done)
+
+        total = gauges.get("details_total")
+        if total:
+            eta = "-"
+            if self._rate and done < total:
+                eta = _duration((total - done) / self._rate)
+            position = f"{done}/{total} ({done / total:.0%}) ETA {eta}"
+        else:
+            position = f"{done}/? (collecting)"
+
+        def ms(stage):
+            p50 = stages[stage]["p50"]
+            return f"{p50 * 1000:.0f}" if p50 is not None else "-"
+
+        statuses = " ".join(f"{k}:{v}" for k, v in sorted(snap["statuses"].items()))
+        queues = " ".join(
+            f"{name} {gauges[name]:.0f}" for name in ("link_queue", "in_flight", "concurrency_limit")
+            if gauges.get(name) is not None
+        )
+        label = "done" if final else "progress"
+        return (f"[{label} {_duration(snap['elapsed'])}] details {position} "
+                f"{self._rate or 0:.1f}/s | links {counters.get('links_collected', 0)} | "
+                f"p50 ms ttfb {ms('ttfb')} dl {ms('download')} parse {ms('parse')} "
+                f"extract {ms('extract')} | {queues} | "
+                f"{counters.get('bytes_received', 0) / 1e6:.1f} MB | {statuses}")
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+
+
+CacheEntry = namedtuple(
+    "CacheEntry", "etag last_modified body_hash encoding record compressed_body"
+)
+
+
+class PageCache:
+    """
+    On-disk cache of detail pages for re-crawls, keyed by URL.
+
+    Each entry keeps the zlib-compressed body, its content hash, the
+    ETag/Last-Modified validators the server sent, and the record last
+    extracted from it. A later crawl sends the validators back; on a 304, or
+    when the body hash has not changed, the stored record is reused and the
+    page is not parsed again.
+    """
+
+    def __init__(self, path="src/page_cache.sqlite"):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                encoding TEXT,
+                record TEXT,
+                body BLOB
+            )
+            """
+        )
+        self.hits = 0
+        self.not_modified = 0
+        self.unchanged = 0
+
+    def get(self, url):
+        """Return the CacheEntry for url, or None if it was never stored."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, body_hash, encoding, record, body "
+                "FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body_hash, encoding, record, body = row
+        return CacheEntry(
+            etag, last_modified, body_hash, encoding,
+            json.loads(record) if record else None, body,
+        )
+
+    @staticmethod
+    def body(entry):
+        """Decompressed body of a cache entry."""
+        return zlib.decompress(entry.compressed_body) if entry.compressed_body else None
+
+    @staticmethod
+    def conditional_headers(entry):
+        """If-None-Match / If-Modified-Since headers for a cached entry."""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store_page(self, url, body, encoding, etag=None, last_modified=None):
+        """
+        Store a freshly downloaded body with its validators.
+        Returns the previous record if the body is unchanged, otherwise None
+        (and the stale record is dropped so it is never reused).
+        """
+        body_hash = hashlib.sha1(body).hexdigest()
+        previous = self.get(url)
+        record = None
+        if previous is not None and previous.body_hash == body_hash:
+            record = previous.record
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, etag, last_modified, body_hash, encoding, record, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url, etag, last_modified, body_hash, encoding,
+                    json.dumps(record) if record is not None else None,
+                    zlib.compress(body, 6),
+                ),
+            )
+        return record
+
+    def store_record(self, url, record):
+        """Attach the record extracted from the stored body of url."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE pages SET record = ? WHERE url = ?",
+                (json.dumps(record), url),
+            )
+
+    def resolve(self, url, entry, status_code, body, encoding, etag, last_modified):
+        """
+        Decide what to do with a response for a cached URL.
+        Returns (record, body, encoding): a reusable record, or the body that
+        still needs parsing.
+        """
+        if status_code == 304 and entry is not None:
+            with self.lock:
+                self.not_modified += 1
+                if entry.record is not None:
+                    self.hits += 1
+            if entry.record is not None:
+                return entry.record, None, None
+            return None, self.body(entry), entry.encoding
+
+        record = self.store_page(url, body, encoding, etag, last_modified)
+        if record is not None:
+            with self.lock:
+                self.unchanged += 1
+                self.hits += 1
+            return record, None, None
+        return None, body, encoding
+
+    def stats(self):
+        with self.lock:
+            return (f"page cache: {self.hits} records reused "
+                    f"({self.not_modified} not modified, {self.unchanged} unchanged bodies)")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,107 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lib.records import RecordBuffer
+
+
+# Typed columns for DETAILS_FIELDS: "N/A" becomes a null and the
+# subtype/locality codes are dictionary-encoded. Values parsed from free
+# text are int64 (digits are joined, so they can be large); the mapped
+# codes and yes/no flags fit in int8.
+DETAILS_SCHEMA = pa.schema([
+    ("Link", pa.string()),
+    ("Locality", pa.dictionary(pa.int16(), pa.string())),
+    ("Type of property", pa.int8()),
+    ("Subtype of property", pa.dictionary(pa.int8(), pa.string())),
+    ("Price", pa.int64()),
+    ("Type of sale", pa.int8()),
+    ("Number of rooms", pa.int64()),
+    ("Livable surface", pa.int64()),
+    ("Fully equipped kitchen", pa.int8()),
+    ("Furnished", pa.int8()),
+    ("Fireplace", pa.int8()),
+    ("Terrace", pa.int8()),
+    ("Surface terrace", pa.int64()),
+    ("Garden", pa.int8()),
+    ("Garden area", pa.int64()),
+    ("Total land surface", pa.int64()),
+    ("Number of facades", pa.int64()),
+    ("Swimming pool", pa.int8()),
+    ("State of the property", pa.int8()),
+])
+
+
+class ParquetSink:
+    """
+    Write scraped records to a typed Parquet file, one row group per batch.
+
+    Same interface as CsvSink: records are buffered in a RecordBuffer up to
+    batch_size, each full batch is converted column by column against
+    DETAILS_SCHEMA and written as a row group, and the file is renamed into
+    place on close.
+    """
+
+    def __init__(self, output_file, fields, batch_size=10000, append=False,
+                 schema=DETAILS_SCHEMA, compression="zstd"):
+        if append:
+            raise ValueError("Parquet output cannot be appended to; use a CSV file for incremental runs")
+        if list(fields) != schema.names:
+            raise ValueError("Parquet schema does not match the detail fields")
+
+        self.output_file = output_file
+        self.fields = fields
+        self.batch_size = batch_size
+        self.schema = schema
+        self.compression = compression
+        self.tmp_file = output_file + ".part"
+        self.buffer = RecordBuffer(fields)
+        self.count = 0
+        self.writer = None
+
+        # Ensure the output directory exists
+        output_dir = os.path.dirname(output_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not len(self.buffer):
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.tmp_file, self.schema, compression=self.compression)
+        self.writer.write_batch(self.buffer.to_arrow(self.schema))
+        self.count += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        if self.writer is None:
+            print("No data scraped, file not written.")
+            return
+        self.writer.close()
+        os.replace(self.tmp_file, self.output_file)
+        print(f"Saved {self.count} records to {self.output_file}")
+
+    def abort(self):
+        """Drop unwritten records and any temporary file."""
+        self.buffer.clear()
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,78 @@
+import queue
+import threading
+
+
+class LinkPipeline:
+    """
+    Run link collection and detail scraping concurrently.
+
+    A producer thread drains a link generator (typically built on
+    LinkCollector.iter_cards_*) into a bounded queue while the scraper
+    consumes it, so detail fetches start with the first results page and wall
+    time approaches the slower of the two phases.
+    """
+
+    _DONE = object()
+
+    def __init__(self, scraper, queue_size=1000):
+        self.scraper = scraper
+        self.links = queue.Queue(maxsize=queue_size)
+        self.produced = 0
+        self._stop = threading.Event()
+        self._error = None
+        self.metrics = getattr(scraper, "metrics", None)
+        if self.metrics:
+            self.metrics.track("link_queue", self.links.qsize)
+
+    def _put(self, item):
+        # Block on a full queue, but wake up regularly to honour stop().
+        while not self._stop.is_set():
+            try:
+                self.links.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, source):
+        try:
+            for link in source:
+                if not self._put(link):
+                    break
+                self.produced += 1
+        except BaseException as e:
+            # Re-raised by run() so a failed collection is never mistaken for a complete one
+            self._error = e
+            print(f"Link collection failed: {e}")
+        finally:
+            if self.metrics:
+                # Collection is over, so the progress line can show an ETA
+                self.metrics.gauge("details_total", self.produced)
+            self._put(self._DONE)
+
+    def _consume(self):
+        while True:
+            link = self.links.get()
+            if link is self._DONE:
+                return
+            yield link
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, links, output_file, **store_kwargs):
+        """
+        Collect and scrape in one pass: 'links' is iterated on a producer
+        thread and the scraped details are written to output_file.
+        store_kwargs are passed on to the scraper's scrape_and_store.
+        """
+        producer = threading.Thread(target=self._produce, args=(links,), daemon=True)
+        producer.start()
+        try:
+            self.scraper.scrape_and_store(self._consume(), output_file, **store_kwargs)
+        finally:
+            self.stop()
+            producer.join()
+        print(f"Total links collected: {self.produced}")
+        if self._error:
+            raise self._error
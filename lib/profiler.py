@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Profile:
+    """
+    Time and call count per stack of spans for one page, e.g.
+    ("row:Garden", "find"). Filled by the parse methods on a single
+    thread, and small enough to ship back from the parse processes.
+    """
+
+    def __init__(self):
+        # stack of span names -> [seconds, calls]
+        self.samples = {}
+        self.stack = []
+
+    @contextmanager
+    def span(self, name):
+        self.stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            key = tuple(self.stack)
+            self.stack.pop()
+            sample = self.samples.get(key)
+            if sample is None:
+                self.samples[key] = [elapsed, 1]
+            else:
+                sample[0] += elapsed
+                sample[1] += 1
+
+
+class _NoProfile:
+    _NULL = nullcontext()
+
+    def span(self, name):
+        return self._NULL
+
+
+# Stands in when profiling is off, so spans cost next to nothing
+NO_PROFILE = _NoProfile()
+
+
+def page_profile(timings):
+    """The Profile a parse method should fill: the one in 'timings', if any."""
+    if timings is None:
+        return NO_PROFILE
+    return timings.get("profile", NO_PROFILE)
+
+
+class ExtractionProfiler:
+    """
+    Cumulative time and call count per field extractor and DOM operation
+    across a run, merged from the pages' Profiles. report() ranks the
+    stacks by time; export_collapsed() writes them in the collapsed-stack
+    format read by flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, root="extract"):
+        self.root = root
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.pages = 0
+
+    def merge(self, profile):
+        with self.lock:
+            self.pages += 1
+            for stack, (seconds, calls) in profile.samples.items():
+                sample = self.samples.setdefault(stack, [0.0, 0])
+                sample[0] += seconds
+                sample[1] += calls
+
+    def _snapshot(self):
+        with self.lock:
+            return {stack: tuple(sample) for stack, sample in self.samples.items()}, self.pages
+
+    @staticmethod
+    def _self_times(samples):
+        """Seconds per stack not spent in a nested span."""
+        child_time = {}
+        for stack, (seconds, _) in samples.items():
+            if len(stack) > 1:
+                child_time[stack[:-1]] = child_time.get(stack[:-1], 0.0) + seconds
+        return {stack: max(seconds - child_time.get(stack, 0.0), 0.0)
+                for stack, (seconds, _) in samples.items()}
+
+    def report(self, top=25):
+        """
+        The 'top' stacks by cumulative time, with calls, mean and share of
+        the total, then the self time per operation summed over all fields
+        (e.g. every "find").
+        """
+        samples, pages = self._snapshot()
+        if not samples:
+            return "extraction profile: no pages profiled"
+        total = sum(seconds for stack, (seconds, _) in samples.items() if len(stack) == 1)
+        lines = [f"extraction profile ({pages} pages, {total * 1000:.1f} ms), by cumulative time:",
+                 f"{'total ms':>10} {'calls':>8} {'mean us':>9} {'share':>6}  stack"]
+        ranked = sorted(samples.items(), key=lambda item: item[1][0], reverse=True)
+        for stack, (seconds, calls) in ranked[:top]:
+            lines.append(f"{seconds * 1000:>10.1f} {calls:>8} {seconds / calls * 1e6:>9.1f} "
+                         f"{seconds / total if total else 0:>6.1%}  {';'.join(stack)}")
+
+        operations = {}
+        for stack, seconds in self._self_times(samples).items():
+            operations[stack[-1]] = operations.get(stack[-1], 0.0) + seconds
+        ranked = sorted(operations.items(), key=lambda item: item[1], reverse=True)
+        lines.append("self time by operation: " + ", ".join(
+            f"{name} {seconds * 1000:.1f} ms ({seconds / total if total else 0:.0%})"
+            for name, seconds in ranked[:10]
+        ))
+        return "\n".join(lines)
+
+    def export_collapsed(self, path):
+        """
+        Write one 'root;span;...;span microseconds' line per stack with its
+        self time (the time not spent in a nested span).
+        """
+        samples, _ = self._snapshot()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, self_time in sorted(self._self_times(samples).items()):
+                f.write(f"{';'.join((self.root,) + stack)} {round(self_time * 1e6)}\n")
+        print(f"Wrote the extraction profile to {path}")
@@ -0,0 +1,161 @@
+import asyncio
+import email.utils
+import threading
+import time
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency controller shared by the collector and the scrapers.
+
+    Every request takes a slot; at most 'limit' slots are held at once.
+    After each window of completed requests the limit grows by one if the
+    p95 latency stayed under latency_target and the error rate under
+    error_threshold (additive increase). A 429, a 5xx or a failed request
+    cuts the limit by 'backoff' (multiplicative decrease), at most once per
+    cooldown so a burst of errors from the same moment counts once. A
+    Retry-After header pauses all new requests until it has passed.
+    """
+
+    OVERLOAD_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, initial=8, min_limit=1, max_limit=64, latency_target=2.0,
+                 error_threshold=0.02, window=20, backoff=0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.window = window
+        self.backoff = backoff
+
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._latencies = []
+        self._errors = 0
+        self._last_decrease = 0.0
+        self._cooldown = 1.0
+
+        self.peak = self.limit
+        self.decreases = 0
+        self.pauses = 0
+
+    # --- slots ------------------------------------------------------------
+
+    def _try_acquire(self):
+        """Take a slot if one is free; returns (start_time, None) or (None, delay)."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return None, self.paused_until - now
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return now, None
+        return None, None
+
+    def acquire(self):
+        """Block until a slot is free; returns the start time for release()."""
+        with self.cond:
+            while True:
+                start, delay = self._try_acquire()
+                if start is not None:
+                    return start
+                self.cond.wait(delay)
+
+    async def acquire_async(self):
+        """acquire() for coroutines: polls instead of blocking the event loop."""
+        while True:
+            with self.cond:
+                start, delay = self._try_acquire()
+            if start is not None:
+                return start
+            await asyncio.sleep(delay if delay is not None else 0.01)
+
+    def release(self, start, status=None, retry_after=None):
+        """
+        Return a slot. status is the HTTP status code, or None if the request
+        failed without a response (timeout, connection error).
+        """
+        now = time.monotonic()
+        with self.cond:
+            self.in_flight -= 1
+            if status is None or status in self.OVERLOAD_STATUSES:
+                self._errors += 1
+                self._decrease(now)
+                self._pause(now, retry_after)
+            else:
+                self._latencies.append(now - start)
+            if len(self._latencies) + self._errors >= self.window:
+                self._evaluate(now)
+            self.cond.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        """Run func (e.g. session.get) in a slot, feeding its response back."""
+        start = self.acquire()
+        try:
+            resp = func(*args, **kwargs)
+        except Exception:
+            self.release(start)
+            raise
+        self.release(start, resp.status_code, resp.headers.get("Retry-After"))
+        return resp
+
+    async def call_async(self, func, *args, **kwargs):
+        """call() for coroutine functions such as httpx.AsyncClient.get."""
+        start = await self.acquire_async()
+        try:
+            resp = await func(*args, **kwargs)
+        except Exception:
+            self.release(start)
+            raise
+        self.release(start, resp.status_code, resp.headers.get("Retry-After"))
+        return resp
+
+    # --- control loop -------------------------------------------------------
+
+    def _evaluate(self, now):
+        latencies = sorted(self._latencies)
+        total = len(latencies) + self._errors
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else None
+        if p95 is not None:
+            # Wait about one round trip before reacting to errors again
+            self._cooldown = max(1.0, p95)
+        if p95 is not None and p95 > self.latency_target:
+            self._decrease(now)
+        elif self._errors / total <= self.error_threshold:
+            self.limit = min(self.max_limit, self.limit + 1)
+            self.peak = max(self.peak, self.limit)
+        self._latencies = []
+        self._errors = 0
+
+    def _decrease(self, now):
+        if now - self._last_decrease < self._cooldown:
+            return
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._last_decrease = now
+        self.decreases += 1
+
+    def _pause(self, now, retry_after):
+        delay = self.parse_retry_after(retry_after)
+        if delay and now + delay > self.paused_until:
+            self.paused_until = now + delay
+            self.pauses += 1
+            print(f"Server asked to retry after {delay:.0f}s, pausing requests")
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Seconds to wait for a Retry-After header (delta-seconds or HTTP date)."""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, when.timestamp() - time.time())
+
+    def stats(self):
+        return (f"rate limiter: limit {int(self.limit)} (peak {int(self.peak)}), "
+                f"{self.decreases} backoffs, {self.pauses} Retry-After pauses")
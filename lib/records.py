@@ -0,0 +1,124 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from lib.field_specs import DETAILS_FIELDS, FIELD_SPECS
+
+
+# Missing values ("N/A") in the numeric and code columns. Every extracted
+# number is a non-negative int, so -1 never collides with real data.
+NA = -1
+_INT64_MAX = 2 ** 63 - 1
+
+# Storage per column kind: (array typecode, numpy dtype)
+_STORAGE = {
+    "int": ("q", np.int64),
+    "code": ("b", np.int8),
+    "category": ("h", np.int16),
+}
+
+
+def _column_kind(spec):
+    """How a field is stored: free-text ints, small codes, or categories."""
+    if spec.kind == "digits":
+        return "int"
+    if spec.kind == "number":
+        return "category"
+    if spec.kind in ("prefix", "contains"):
+        return "category" if isinstance(spec.mapping[0][1], str) else "code"
+    return "code"
+
+
+COLUMN_KINDS = {spec.field: _column_kind(spec) for spec in FIELD_SPECS}
+COLUMN_KINDS["Link"] = "text"
+
+
+class RecordBuffer:
+    """
+    Struct-of-arrays buffer for detail records.
+
+    Instead of keeping one 19-key dict per listing, every column is a typed
+    array: ints and small-int codes in array('q')/array('b') with NA for
+    "N/A", and strings such as locality or subtype as int16 codes into a
+    per-column category list. A buffered record costs a few dozen bytes
+    plus its link, and to_frame/to_arrow build columns straight from the
+    arrays without an intermediate list of dicts.
+    """
+
+    __slots__ = ("fields", "kinds", "columns", "categories", "lookups")
+
+    def __init__(self, fields=DETAILS_FIELDS):
+        self.fields = list(fields)
+        # Fields without a spec (e.g. "Garden area") are ints that stay N/A
+        self.kinds = [COLUMN_KINDS.get(field, "int") for field in self.fields]
+        self.clear()
+
+    def clear(self):
+        self.columns = [
+            [] if kind == "text" else array(_STORAGE[kind][0])
+            for kind in self.kinds
+        ]
+        self.categories = [[] if kind == "category" else None for kind in self.kinds]
+        self.lookups = [{} if kind == "category" else None for kind in self.kinds]
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def append(self, record):
+        for i, field in enumerate(self.fields):
+            kind = self.kinds[i]
+            value = record.get(field, "N/A")
+            if kind == "text":
+                self.columns[i].append(value)
+            elif value == "N/A" or value is None:
+                self.columns[i].append(NA)
+            elif kind == "category":
+                lookup = self.lookups[i]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(self.categories[i])
+                    self.categories[i].append(value)
+                self.columns[i].append(code)
+            else:
+                value = int(value)
+                self.columns[i].append(value if value <= _INT64_MAX else NA)
+
+    def _values(self, i):
+        return np.frombuffer(self.columns[i], dtype=_STORAGE[self.kinds[i]][1])
+
+    def to_frame(self):
+        """DataFrame with nullable integer and categorical columns."""
+        data = {}
+        for i, field in enumerate(self.fields):
+            kind = self.kinds[i]
+            if kind == "text":
+                data[field] = self.columns[i]
+            elif kind == "category":
+                data[field] = pd.Categorical.from_codes(
+                    self._values(i).astype(np.int64), categories=self.categories[i]
+                )
+            else:
+                values = self._values(i)
+                data[field] = pd.arrays.IntegerArray(values.copy(), values == NA)
+        return pd.DataFrame(data, columns=self.fields)
+
+    def to_arrow(self, schema):
+        """pyarrow RecordBatch matching schema (column names must match fields)."""
+        import pyarrow as pa
+
+        columns = []
+        for i, field in enumerate(schema):
+            kind = self.kinds[i]
+            if kind == "text":
+                columns.append(pa.array(self.columns[i], type=field.type))
+                continue
+            values = self._values(i)
+            mask = values == NA
+            if kind == "category":
+                indices = pa.array(values, mask=mask).cast(field.type.index_type)
+                dictionary = pa.array(self.categories[i], type=field.type.value_type)
+                columns.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            else:
+                columns.append(pa.array(values, mask=mask).cast(field.type))
+        return pa.record_batch(columns, schema=schema)
@@ -0,0 +1,162 @@
+import asyncio
+import csv
+import os
+import random
+import threading
+import time
+
+import requests
+
+from lib.rate_limiter import AdaptiveLimiter
+
+
+class FetchError(Exception):
+    """A request that still failed after its retries; carries the error class."""
+
+    def __init__(self, url, error_class, message, status=None, attempts=1):
+        super().__init__(f"{error_class}: {message}")
+        self.url = url
+        self.error_class = error_class
+        self.message = message
+        self.status = status
+        self.attempts = attempts
+
+
+# Errors of the request itself; anything else (a TypeError in a callback,
+# a KeyError in the code around the request) is a bug and is not retried
+try:
+    import httpx
+    TRANSPORT_ERRORS = (requests.RequestException, httpx.HTTPError, FetchError)
+except ImportError:
+    TRANSPORT_ERRORS = (requests.RequestException, FetchError)
+
+
+class RetryPolicy:
+    """
+    Retries for one class of error: up to 'attempts' tries in total, waiting
+    a full-jitter exponential backoff between them (random up to
+    base_delay * 2**n, capped at max_delay, never less than Retry-After).
+    'requeue' links get another chance in the second pass after the main
+    pass has drained.
+    """
+
+    def __init__(self, attempts, base_delay=0.0, max_delay=0.0, requeue=False):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requeue = requeue
+
+    def delay(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after or 0.0)
+
+
+# Detail pages: a few quick tries, then the second pass
+DETAIL_POLICIES = {
+    "throttled": RetryPolicy(2, base_delay=2.0, max_delay=60.0, requeue=True),
+    "server": RetryPolicy(3, base_delay=1.0, max_delay=30.0, requeue=True),
+    "network": RetryPolicy(3, base_delay=0.5, max_delay=15.0, requeue=True),
+    "gone": RetryPolicy(1),
+    "client": RetryPolicy(1),
+}
+
+# Result pages are walked in order, so each one is retried harder in place
+PAGE_POLICIES = {
+    "throttled": RetryPolicy(6, base_delay=2.0, max_delay=60.0),
+    "server": RetryPolicy(5, base_delay=1.0, max_delay=30.0),
+    "network": RetryPolicy(5, base_delay=0.5, max_delay=15.0),
+    "gone": RetryPolicy(1),
+    "client": RetryPolicy(1),
+}
+
+
+def classify(exc):
+    """
+    Map a requests/httpx exception to (error_class, status, retry_after).
+    Errors without a response (timeouts, resets, DNS) are "network"; a
+    FetchError keeps its class.
+    """
+    if isinstance(exc, FetchError):
+        return exc.error_class, exc.status, None
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        return "network", None, None
+    retry_after = AdaptiveLimiter.parse_retry_after(response.headers.get("Retry-After"))
+    if status == 429:
+        return "throttled", status, retry_after
+    if status == 408 or status >= 500:
+        return "server", status, retry_after
+    if status in (404, 410):
+        return "gone", status, None
+    return "client", status, None
+
+
+def _next_delay(url, exc, attempt, policies):
+    """Delay before the next attempt, or raise FetchError when out of attempts."""
+    error_class, status, retry_after = classify(exc)
+    policy = policies[error_class]
+    if attempt >= policy.attempts:
+        raise FetchError(url, error_class, str(exc), status, attempt) from exc
+    return policy.delay(attempt, retry_after)
+
+
+def call_with_retry(func, url, policies=DETAIL_POLICIES):
+    """
+    Call func() until it returns, retrying TRANSPORT_ERRORS according to
+    policies. Other exceptions propagate at once.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func()
+        except TRANSPORT_ERRORS as e:
+            time.sleep(_next_delay(url, e, attempt, policies))
+
+
+async def call_with_retry_async(func, url, policies=DETAIL_POLICIES):
+    """call_with_retry for a coroutine function."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await func()
+        except TRANSPORT_ERRORS as e:
+            await asyncio.sleep(_next_delay(url, e, attempt, policies))
+
+
+class DeadLetters:
+    """Links that still failed after the retry passes, with why."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.errors = []
+
+    def add(self, error):
+        with self.lock:
+            self.errors.append(error)
+
+    def __len__(self):
+        return len(self.errors)
+
+    def summary(self):
+        counts = {}
+        for error in self.errors:
+            counts[error.error_class] = counts.get(error.error_class, 0) + 1
+        details = ", ".join(f"{count} {name}" for name, count in sorted(counts.items()))
+        return f"{len(self.errors)} links failed ({details})" if self.errors else "no failed links"
+
+    def export(self, filename):
+        """Append failed links to a CSV file (creates file with header if needed)."""
+        if not self.errors:
+            return
+        file_exists = os.path.exists(filename)
+        with open(filename, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if not file_exists:
+                writer.writerow(["Link", "Error", "Status", "Attempts", "Message"])
+            for error in self.errors:
+                writer.writerow([error.url, error.error_class, error.status or "",
+                                 error.attempts, error.message])
+        print(f"Appended {len(self.errors)} failed links to {filename}")
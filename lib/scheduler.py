@@ -0,0 +1,101 @@
+import time
+
+
+class WorkScheduler:
+    """
+    Hand out detail links most valuable first, within a per-run budget.
+
+    Collected cards are sorted into classes by what the link index knows:
+    "new" listings that were never scraped, "changed" ones whose card price
+    moved (or that were relisted, moved or failed) since their last scrape,
+    and, with refresh_after, "stale" ones whose record is older than that
+    many seconds. Links are handed out class by class in 'priorities' order,
+    changed and stale ones oldest record first, until the budget runs out:
+    max_seconds from the scheduler's creation or max_requests detail pages.
+    Ordering needs the whole collection, so links only start flowing once
+    it has finished. Links left over come up again next run.
+    """
+
+    PRIORITIES = ("new", "changed", "stale")
+
+    def __init__(self, index=None, max_seconds=None, max_requests=None, refresh_after=None,
+                 priorities=PRIORITIES, metrics=None):
+        # Without an index every link counts as new
+        self.index = index
+        self.deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        self.max_requests = max_requests
+        self.refresh_after = refresh_after
+        self.priorities = priorities
+        self.metrics = metrics
+        self.queued = {name: 0 for name in priorities}
+        self.scheduled = {name: 0 for name in priorities}
+        self.stopped_by = None
+
+    def _classify(self, cards):
+        """Yield (class, scraped_at, link) for the cards worth scraping."""
+        if self.index is None:
+            for link, _ in cards:
+                yield "new", 0, link
+            return
+        now = time.time()
+        for link, _, state in self.index.observe_cards(cards):
+            if state == "new":
+                yield state, 0, link
+                continue
+            # Records from before scrape times were kept count as the oldest
+            scraped_at = self.index.scraped_at(link) or 0
+            if state == "changed":
+                yield state, scraped_at, link
+            elif self.refresh_after is not None and now - scraped_at >= self.refresh_after:
+                yield "stale", scraped_at, link
+
+    def _budget_left(self, handed_out):
+        if self.max_requests is not None and handed_out >= self.max_requests:
+            self.stopped_by = "requests"
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stopped_by = "time"
+        return self.stopped_by is None
+
+    def schedule(self, cards):
+        """
+        Collect every (link, card_price) from cards, then yield links in
+        priority order while the budget lasts. The budget is checked as the
+        scraper asks for each link, so pages already in flight still finish.
+        """
+        queues = {name: [] for name in self.priorities}
+        for name, scraped_at, link in self._classify(cards):
+            if name in queues:
+                queues[name].append((scraped_at, link))
+        for name in ("changed", "stale"):
+            if name in queues:
+                queues[name].sort()
+        for name, queue in queues.items():
+            self.queued[name] = len(queue)
+        total = sum(self.queued.values())
+        print(f"Scheduled {self._counts(self.queued)}")
+        if self.metrics:
+            self.metrics.gauge("details_total", min(total, self.max_requests or total))
+
+        handed_out = 0
+        for name in self.priorities:
+            for _, link in queues[name]:
+                if not self._budget_left(handed_out):
+                    print(f"Out of {self.stopped_by} budget: {total - handed_out} links "
+                          f"left for the next run")
+                    return
+                handed_out += 1
+                self.scheduled[name] += 1
+                yield link
+            queues[name] = None
+
+    def _counts(self, counts):
+        return ", ".join(f"{counts[name]} {name}" for name in self.priorities)
+
+    def stats(self):
+        handed_out = ", ".join(
+            f"{self.scheduled[name]}/{self.queued[name]} {name}" for name in self.priorities
+        )
+        line = f"scheduler: handed out {handed_out}"
+        if self.stopped_by:
+            line += f" (stopped by the {self.stopped_by} budget)"
+        return line
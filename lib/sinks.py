@@ -0,0 +1,79 @@
+import os
+
+from lib.records import RecordBuffer
+
+
+class CsvSink:
+    """
+    Write scraped records to CSV in fixed-size batches as they arrive.
+
+    Only one batch is held in memory, as a compact RecordBuffer. A full
+    write goes to a temporary file next to the target and is renamed over it
+    on close, so readers see either the previous file or the complete new
+    one, never a half-written file.
+    In append mode batches are appended to the existing file directly.
+    If the scrape fails, the temporary file is discarded.
+    """
+
+    def __init__(self, output_file, fields, batch_size=500, append=False):
+        self.output_file = output_file
+        self.fields = fields
+        self.batch_size = batch_size
+        self.append = append and os.path.exists(output_file)
+        self.tmp_file = output_file if self.append else output_file + ".part"
+        self.buffer = RecordBuffer(fields)
+        self.count = 0
+        self._header_written = self.append
+
+        # Ensure the output directory exists
+        output_dir = os.path.dirname(output_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not len(self.buffer):
+            return
+        df = self.buffer.to_frame()
+        df.to_csv(
+            self.tmp_file,
+            mode="a" if self._header_written else "w",
+            header=not self._header_written,
+            index=False,
+            na_rep="N/A",
+            encoding='utf-8',
+        )
+        self._header_written = True
+        self.count += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        if not self.count:
+            print("No data scraped, file not written.")
+            return
+        if self.append:
+            print(f"Appended {self.count} records to {self.output_file}")
+            return
+        os.replace(self.tmp_file, self.output_file)
+        print(f"Saved {self.count} records to {self.output_file}")
+
+    def abort(self):
+        """Drop unwritten records and any temporary file."""
+        self.buffer.clear()
+        if not self.append and os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,168 @@
+import json
+
+try:
+    # Optional: several times faster than the json module on large blobs
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from lib import field_specs
+from lib.listing_ids import listing_id
+
+
+# Where embedded listing data starts: a JSON-LD script, or a data-layer push
+JSON_LD_MARKER = "application/ld+json"
+DATA_LAYER_MARKER = "dataLayer.push("
+SCRIPT_END = "</script>"
+
+# Keys that may hold each text build_record reads, as dotted paths into the
+# blob: schema.org names first, then common data-layer spellings. Check them
+# against saved listing pages with the hit rate the scraper reports, and
+# extend them when the site's blob uses other names.
+HEADER_KEYS = {
+    "locality": ["address.postalCode", "postalCode", "zip", "postal_code"],
+    "price": ["offers.price", "price"],
+}
+ROW_KEYS = {
+    "Number of bedrooms": ["numberOfBedrooms", "bedrooms", "nb_bedrooms"],
+    "Livable surface": ["floorSize.value", "livable_surface", "surface"],
+    "Kitchen equipment": ["kitchen_equipment", "kitchen"],
+    "Furnished": ["furnished"],
+    "Fireplace": ["fireplace"],
+    "Terrace": ["terrace"],
+    "Surface terrace": ["terrace_surface", "surface_terrace"],
+    "Garden": ["garden"],
+    "Total land surface": ["land_surface", "total_land_surface"],
+    "Number of facades": ["facades", "number_of_facades"],
+    "Swimming pool": ["swimming_pool", "pool"],
+}
+STATE_KEYS = ["state", "condition", "property_state"]
+
+
+def find_blobs(body, encoding=None):
+    """
+    Yield the decoded JSON objects embedded in a page, found with a plain
+    substring scan instead of an HTML parse. 'body' may be text or raw
+    bytes; for bytes only the blobs themselves are decoded.
+    """
+    is_bytes = isinstance(body, bytes)
+    for marker in (JSON_LD_MARKER, DATA_LAYER_MARKER):
+        needle = marker.encode() if is_bytes else marker
+        script_end = SCRIPT_END.encode() if is_bytes else SCRIPT_END
+        pos = body.find(needle)
+        while pos != -1:
+            start = pos + len(needle)
+            if marker == JSON_LD_MARKER:
+                start = body.find(b">" if is_bytes else ">", start)
+                if start == -1:
+                    # A <script tag cut off before its '>': nothing more to read
+                    break
+                start += 1
+            end = body.find(script_end, start)
+            if end == -1:
+                break
+            text = body[start:end]
+            if is_bytes:
+                text = text.decode(encoding or "utf-8", errors="replace")
+            text = text.strip().rstrip(";").strip()
+            if marker == DATA_LAYER_MARKER and text.endswith(")"):
+                text = text[:-1]
+            try:
+                blob = _loads(text)
+            except ValueError:
+                blob = None
+            if isinstance(blob, dict):
+                yield blob
+            elif isinstance(blob, list):
+                for item in blob:
+                    if isinstance(item, dict):
+                        yield item
+            pos = body.find(needle, end)
+
+
+_MISSING = object()
+
+
+def _is_listing_blob(blob, lid):
+    """
+    Whether a blob describes the listing itself: one of its top-level
+    values names the listing ID (an @id, url, identifier or sku). Blobs of
+    related listings, analytics and other widgets share key names such as
+    "price" or "state", but not the ID.
+    """
+    for value in blob.values():
+        if isinstance(value, (str, int)) and not isinstance(value, bool):
+            text = str(value).lower()
+            if text == lid or text.rstrip("/").endswith("/" + lid):
+                return True
+    return False
+
+
+def _lookup(blobs, path):
+    for blob in blobs:
+        value = blob
+        for key in path.split("."):
+            if not isinstance(value, dict) or key not in value:
+                value = _MISSING
+                break
+            value = value[key]
+        if value is not _MISSING:
+            return value
+    return _MISSING
+
+
+def _text(value):
+    """A JSON value as the text the HTML would show, for the field converters."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, float) and value.is_integer():
+        # 350000.0 would otherwise read as 3500000
+        value = int(value)
+    return str(value)
+
+
+def _first(blobs, paths):
+    for path in paths:
+        value = _lookup(blobs, path)
+        if value is not _MISSING:
+            return value
+    return _MISSING
+
+
+def extract_structured(body, link, encoding=None):
+    """
+    Read the texts for build_record from the embedded JSON of the page of
+    'link'. Only blobs that name the link's listing ID are read. Returns
+    (texts, None) when they cover every field, else (None, reason) with
+    reason "no_blob" or "incomplete"; the title is left to the link's slug.
+    """
+    blobs = list(find_blobs(body, encoding))
+    # @graph wraps several JSON-LD nodes in one script
+    for blob in list(blobs):
+        graph = blob.get("@graph")
+        if isinstance(graph, list):
+            blobs.extend(node for node in graph if isinstance(node, dict))
+    lid = listing_id(link)
+    blobs = [blob for blob in blobs if _is_listing_blob(blob, lid)]
+    if not blobs:
+        return None, "no_blob"
+
+    texts = {"title": None, "rows": {}}
+    for source, paths in HEADER_KEYS.items():
+        value = _first(blobs, paths)
+        if value is _MISSING:
+            return None, "incomplete"
+        texts[source] = _text(value)
+    for label in field_specs.ROW_LABELS:
+        value = _first(blobs, ROW_KEYS.get(label, []))
+        if value is _MISSING:
+            return None, "incomplete"
+        texts["rows"][label.lower()] = _text(value)
+    state = _first(blobs, STATE_KEYS)
+    if state is _MISSING:
+        return None, "incomplete"
+    texts["state"] = _text(state)
+    return texts, None
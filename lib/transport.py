@@ -0,0 +1,86 @@
+import requests
+import urllib3.response
+from requests.adapters import HTTPAdapter
+
+
+def _accept_encoding():
+    """
+    Every encoding urllib3 can decode here: gzip and deflate always, br and
+    zstd only when urllib3 found a decoder for them, so a server never sends
+    a body that reaches the parser still compressed. Which package provides
+    the decoder depends on the urllib3 version (zstandard in older 2.x
+    releases, backports.zstd in newer ones), so urllib3 is asked rather
+    than the packages.
+    """
+    encodings = ["gzip", "deflate"]
+    if getattr(urllib3.response, "brotli", None) is not None:
+        encodings.append("br")
+    # urllib3 1.x has no zstd support at all
+    if getattr(urllib3.response, "HAS_ZSTD", False):
+        encodings.append("zstd")
+    return ", ".join(encodings)
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+
+def make_session(headers, pool_size=10, metrics=None):
+    """
+    requests.Session for one site, meant to be shared by all threads of a
+    client. Its pool keeps up to pool_size keep-alive connections, so size
+    it to the number of threads that use it: with the default of 10, extra
+    threads open connections that are thrown away after one request.
+    With metrics, connection setup times and counts are reported.
+    """
+    s = requests.Session()
+    s.headers.update(headers)
+    s.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    if metrics:
+        adapter = metrics.adapter(pool_maxsize=pool_size)
+    else:
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+# A body cut short with at most this many bytes still to come is read to
+# the end and thrown away so its connection can be reused; a longer rest is
+# cheaper to skip at the cost of a new connection. Once part of a body has
+# been decoded urllib3 refuses raw reads, so how the rest is read is up to
+# drain_conn, which in recent urllib3 releases skips decompressing it
+DRAIN_LIMIT = 32 * 1024
+
+
+def remaining_bytes(headers, received):
+    """Bytes of the response still on the way, or None if there is no Content-Length."""
+    length = headers.get("Content-Length")
+    if length is None or not length.isdigit():
+        return None
+    return max(int(length) - received, 0)
+
+
+def read_body(resp, stop=None, chunk_size=16384):
+    """
+    Read the body of a response requested with stream=True. Returns
+    (body, wire_bytes): the decoded body and the bytes that came over the
+    network for it, i.e. before decompression. With stop, a callable that
+    is given every decoded chunk as it arrives, reading ends as soon as it
+    returns True. A short rest is then drained so the connection goes back
+    to the pool; a long one is skipped by closing the connection. The body
+    of a stopped read is only in the return value, not in resp.content.
+    """
+    if stop is None:
+        body = resp.content
+    else:
+        chunks = []
+        for chunk in resp.iter_content(chunk_size):
+            chunks.append(chunk)
+            if stop(chunk):
+                remaining = remaining_bytes(resp.headers, resp.raw.tell())
+                if remaining is not None and remaining <= DRAIN_LIMIT:
+                    resp.raw.drain_conn()
+                resp.close()
+                break
+        body = b"".join(chunks)
+    return body, resp.raw.tell()
@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+
+WorkItem = namedtuple("WorkItem", "id kind payload attempts")
+
+
+class WorkQueue:
+    """
+    Shared queue of crawl work items with leases, backed by SQLite.
+
+    Items are a kind ("band", "detail") and a JSON payload; an item is only
+    queued once per kind and key, which is the payload itself unless the
+    caller gives one (e.g. the listing ID of a detail link). A worker leases items for
+    lease_seconds, extends the lease with heartbeat() while it works, and
+    ack()s each item with an optional JSON result. Leases that expire
+    (the worker died or stalled) are handed out again. An item that fails
+    max_attempts times is marked failed.
+
+    Any number of processes can open the same file; on several machines,
+    put it on shared storage or swap in a server-backed queue (e.g. Redis)
+    with the same methods.
+    """
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path="src/work_queue.sqlite", max_attempts=3):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # Autocommit; writes that must be atomic use explicit BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                    timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                updated REAL NOT NULL,
+                key TEXT,
+                UNIQUE (kind, payload)
+            )
+            """
+        )
+        self._migrate()
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS items_key ON items (kind, key)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_status ON items (status, kind)")
+
+    def _migrate(self):
+        # Queues created before items had a key were deduplicated by payload
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(items)")]
+        if "key" not in columns:
+            self.conn.execute("ALTER TABLE items ADD COLUMN key TEXT")
+            self.conn.execute("UPDATE items SET key = payload")
+
+    def _transaction(self, fn):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def put(self, kind, payloads, keys=None):
+        """
+        Queue payloads of one kind; ones whose key is already queued are
+        skipped. 'keys' gives a key per payload (default: the payload).
+        Returns the number added.
+        """
+        now = time.time()
+        payloads = [json.dumps(p) for p in payloads]
+        keys = [str(key) for key in keys] if keys is not None else payloads
+        rows = [(kind, p, key, self.PENDING, now) for p, key in zip(payloads, keys)]
+
+        def insert():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO items (kind, payload, key, status, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self.conn.total_changes - before
+        return self._transaction(insert)
+
+    def lease(self, owner, kind, limit=1, lease_seconds=120):
+        """Lease up to 'limit' pending items of a kind; expired leases are reclaimed first."""
+        now = time.time()
+
+        def take():
+            self._requeue_expired(now)
+            rows = self.conn.execute(
+                "SELECT id, kind, payload, attempts FROM items "
+                "WHERE status = ? AND kind = ? ORDER BY id LIMIT ?",
+                (self.PENDING, kind, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE items SET status = ?, owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                [(self.LEASED, owner, now + lease_seconds, now, row[0]) for row in rows],
+            )
+            return [WorkItem(i, k, json.loads(p), a + 1) for i, k, p, a in rows]
+        return self._transaction(take)
+
+    def _requeue_expired(self, now):
+        # Items of a crashed worker go back to pending, or fail after max_attempts
+        self.conn.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "owner = NULL, error = 'lease expired', updated = ? "
+            "WHERE status = ? AND lease_expires < ?",
+            (self.max_attempts, self.FAILED, self.PENDING, now, self.LEASED, now),
+        )
+
+    def heartbeat(self, owner, ids, lease_seconds=120):
+        """Extend the leases 'owner' still holds on ids. Returns how many were extended."""
+        now = time.time()
+
+        def extend():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "UPDATE items SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                [(now + lease_seconds, now, i, owner, self.LEASED) for i in ids],
+            )
+            return self.conn.total_changes - before
+        return self._transaction(extend)
+
+    def ack(self, owner, results):
+        """
+        Mark items done. 'results' is a list of (id, result) pairs; result is
+        stored as JSON (or None). Items whose lease was lost are left alone.
+        """
+        now = time.time()
+
+        def done():
+            self.conn.executemany(
+                "UPDATE items SET status = ?, result = ?, owner = NULL, updated = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                [(self.DONE, json.dumps(result) if result is not None else None, now,
+                  i, owner, self.LEASED) for i, result in results],
+            )
+        self._transaction(done)
+
+    def nack(self, owner, item_id, error, retry=True):
+        """Give an item back after a failure: pending again, or failed when out of attempts."""
+        now = time.time()
+
+        def release():
+            self.conn.execute(
+                "UPDATE items SET status = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END, "
+                "owner = NULL, error = ?, updated = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (retry, self.max_attempts, self.PENDING, self.FAILED, error, now,
+                 item_id, owner, self.LEASED),
+            )
+        self._transaction(release)
+
+    def reset(self):
+        """Remove every item, to start a new round of work."""
+        self._transaction(lambda: self.conn.execute("DELETE FROM items"))
+
+    def counts(self):
+        """{kind: {status: count}}"""
+        counts = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, status, COUNT(*) FROM items GROUP BY kind, status"
+            ).fetchall()
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def unfinished(self, kind=None):
+        """Number of pending or leased items (of one kind, or all)."""
+        query = "SELECT COUNT(*) FROM items WHERE status IN (?, ?)"
+        params = [self.PENDING, self.LEASED]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self.lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def iter_results(self, kind, status=DONE):
+        """Yield (payload, result, error) for the items of a kind with the given status."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT payload, result, error FROM items WHERE kind = ? AND status = ? ORDER BY id",
+                (kind, status),
+            ).fetchall()
+        for payload, result, error in rows:
+            yield json.loads(payload), json.loads(result) if result else None, error
+
+    def stats(self):
+        parts = []
+        for kind, statuses in sorted(self.counts().items()):
+            detail = ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+            parts.append(f"{kind}: {detail}")
+        return "work queue: " + ("; ".join(parts) if parts else "empty")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,21 +1,232 @@
 from lib.link_collector import LinkCollector
 from lib.detail_scraper import DetailScraper
+from lib.pipeline import LinkPipeline
+from lib.scheduler import WorkScheduler
+from lib.page_cache import PageCache
+from lib.link_index import LinkIndex
+from lib.link_store import LinkStore
+from lib.checkpoint import Checkpoint
+from lib.rate_limiter import AdaptiveLimiter
+from lib.metrics import Metrics, MetricsReporter
+from lib.transport import make_session
 
+# Use a ".parquet" name for typed columnar output (requires pyarrow)
 DETAILS_FILE = "property_details.csv"
+DELISTED_FILE = "property_delisted.csv"
+# Links whose details still failed after every retry; a later run picks them up again
+FAILED_FILE = "property_failed.csv"
+# Output of light runs: only the fields the search-result cards provide
+CARDS_FILE = "property_cards.csv"
 
-def main(test_limit=None):
-    collector = LinkCollector()
-    scraper = DetailScraper(max_workers=12)
+def main(test_limit=None, sharded=False, streaming=False, engine="threads", page_cache=None,
+         link_index=None, checkpoint_dir=None, adaptive=False, metrics_file=None, light=False,
+         extractor="lxml", partial=False, link_store=None, budget_seconds=None,
+         budget_requests=None, refresh_days=None, profile_file=None, process_parse=False,
+         parse_processes=None):
+    # Incremental runs append to the details file, which Parquet cannot do.
+    # Checked before anything is collected, not when the first records are written.
+    if (link_index or link_store) and not light and DETAILS_FILE.endswith(".parquet"):
+        raise ValueError(f"{DETAILS_FILE}: Parquet output cannot be appended to, so it "
+                         "cannot be combined with LINK_INDEX or LINK_STORE; use a .csv "
+                         "DETAILS_FILE for incremental runs")
+    metrics = Metrics()
+    reporter = MetricsReporter(metrics, path=metrics_file).start()
 
-    print("Collecting links...")
-    links = collector.fetch_all_links_dynamic(max_links=test_limit)
-    print(f"Total links collected: {len(links)}")
+    # One limiter for every request to the site, collector and scraper alike
+    limiter = None
+    if adaptive:
+        limiter = AdaptiveLimiter(max_limit=200 if engine == "async" else 64)
+        metrics.track("concurrency_limit", lambda: limiter.limit)
+    cache = PageCache(page_cache) if page_cache else None
+    if engine == "async":
+        # Imported here so httpx is only needed for the async engine
+        from lib.async_scraper import AsyncDetailScraper
+        scraper = AsyncDetailScraper(concurrency=200, extractor=extractor, cache=cache,
+                                     limiter=limiter, metrics=metrics, partial=partial,
+                                     profile_file=profile_file, process_parse=process_parse,
+                                     parse_processes=parse_processes)
+        collector = LinkCollector(limiter=limiter, metrics=metrics)
+    else:
+        # Collector and scraper share one connection pool, sized for both
+        workers = max(12, limiter.max_limit) if limiter else 12
+        session = make_session(DetailScraper.HEADERS, workers + LinkCollector.POOL_SIZE, metrics)
+        scraper = DetailScraper(max_workers=workers, extractor=extractor, cache=cache,
+                                limiter=limiter, metrics=metrics, session=session,
+                                partial=partial, profile_file=profile_file,
+                                process_parse=process_parse, parse_processes=parse_processes)
+        collector = LinkCollector(limiter=limiter, metrics=metrics, session=session)
 
-    print("\nScraping details...")
-    scraper.scrape_and_store(links, DETAILS_FILE)
+    # The memory-mapped store takes the SQLite index's place and also
+    # dedupes the collected links, so they are never held in memory
+    store = LinkStore(link_store) if link_store else None
+    index = store or (LinkIndex(link_index) if link_index else None)
+    if index:
+        index.begin_run()
+    checkpoint = Checkpoint(checkpoint_dir) if checkpoint_dir else None
+
+    if sharded:
+        cards = collector.iter_cards_sharded(max_links=test_limit, checkpoint=checkpoint,
+                                             seen=store)
+    else:
+        cards = collector.iter_cards_dynamic(max_links=test_limit, checkpoint=checkpoint,
+                                             seen=store)
+
+    if light:
+        # Card fields only, without a single detail request. The index still
+        # tracks delistings, but nothing counts as scraped.
+        if index:
+            cards = ((link, price) for link, price, _ in index.observe_cards(cards))
+        try:
+            print("Collecting links and storing card records...")
+            scraper.store_cards(cards, CARDS_FILE)
+        finally:
+            reporter.stop()
+        _finish(collector, limiter, index, checkpoint, test_limit)
+        return
+
+    # A budgeted run scrapes the most valuable pages first; incremental runs
+    # only scrape new or price-changed listings
+    scheduler = None
+    if budget_seconds is not None or budget_requests is not None or refresh_days is not None:
+        # Created before collection starts, so the time budget includes it
+        scheduler = WorkScheduler(
+            index, max_seconds=budget_seconds, max_requests=budget_requests,
+            refresh_after=refresh_days * 86400 if refresh_days is not None else None,
+            metrics=metrics,
+        )
+        links = scheduler.schedule(cards)
+    elif index:
+        links = index.filter_changed(cards)
+    else:
+        links = (link for link, _ in cards)
+
+    # Resumed runs skip links whose details were already journaled
+    hooks = []
+    prior_records = []
+    if checkpoint:
+        links = checkpoint.pending(links)
+        hooks.append(checkpoint.record_detail)
+        prior_records = checkpoint.records
+    if index:
+        hooks.append(index.mark_scraped)
+
+    def on_record(record):
+        for hook in hooks:
+            hook(record)
+
+    store_kwargs = {
+        "append": index is not None,
+        "on_record": on_record if hooks else None,
+        "prior_records": prior_records,
+        "dead_letter_file": FAILED_FILE,
+    }
+
+    try:
+        if scheduler:
+            # Links are handed out lazily so the budget is checked as they are scraped
+            print("Collecting links...")
+            scraper.scrape_and_store(links, DETAILS_FILE, **store_kwargs)
+        elif streaming:
+            print("Collecting links and scraping details...")
+            LinkPipeline(scraper).run(links, DETAILS_FILE, **store_kwargs)
+        else:
+            print("Collecting links...")
+            links = list(links)
+            print(f"Total links collected: {len(links)}")
+
+            print("\nScraping details...")
+            scraper.scrape_and_store(links, DETAILS_FILE, **store_kwargs)
+    finally:
+        # Final progress line and metrics snapshot, also for a failed run
+        reporter.stop()
+        scraper.close()
+
+    if index:
+        for record in prior_records:
+            index.mark_scraped(record)
+    if store:
+        for error in scraper.dead_letters.errors:
+            store.mark_failed(error.url)
+    if scheduler:
+        print(scheduler.stats())
+    _finish(collector, limiter, index, checkpoint, test_limit)
+
+def _finish(collector, limiter, index, checkpoint, test_limit):
+    if limiter:
+        print(limiter.stats())
+
+    if index:
+        print(index.stats())
+        # Only a complete, error-free collection can tell which listings are gone
+        if test_limit is None and not collector.errors:
+            index.export_delisted(index.finish_run(), DELISTED_FILE)
+        index.close()
+
+    if checkpoint:
+        checkpoint.clear()
 
 if __name__ == "__main__":
     # Set TEST_LIMIT to a number (e.g., 1000) to limit collection,
     # or None to collect everything.
     TEST_LIMIT = None  # change this as needed
-    main(test_limit=TEST_LIMIT)
\ No newline at end of file
+    # Set SHARDED to True to walk disjoint price bands in parallel.
+    SHARDED = False
+    # Set STREAMING to True to scrape details while links are still being collected.
+    STREAMING = False
+    # Set ENGINE to "async" to scrape details with the asyncio/httpx engine.
+    ENGINE = "threads"
+    # Set PAGE_CACHE to a file path (e.g. "src/page_cache.sqlite") to reuse
+    # unchanged detail pages between daily re-crawls.
+    PAGE_CACHE = None
+    # Set LINK_INDEX to a file path (e.g. "src/link_index.sqlite") for incremental
+    # runs: only new or price-changed listings are scraped and appended.
+    LINK_INDEX = None
+    # Set CHECKPOINT_DIR (e.g. "src/checkpoint") to make the run resumable; an
+    # interrupted run picks up where it stopped when started again.
+    CHECKPOINT_DIR = None
+    # Set ADAPTIVE to True to let a rate limiter find the highest concurrency
+    # the site tolerates (up to 64 requests at once) instead of the fixed
+    # worker counts.
+    ADAPTIVE = False
+    # Set METRICS_FILE to export stage timings, status codes, bytes and queue
+    # depths while the crawl runs: "src/metrics.prom" for Prometheus text
+    # format, "src/metrics.jsonl" to append a JSON snapshot every 5 seconds.
+    METRICS_FILE = None
+    # Set LIGHT to True to skip detail pages and write only what the search-result
+    # cards give (link, locality, type, subtype, price, type of sale) to CARDS_FILE.
+    LIGHT = False
+    # Set EXTRACTOR to "json" to read detail pages from their embedded JSON
+    # (JSON-LD or data layer) when it has every field, falling back to the HTML
+    # for the rest; the hit rate is printed at the end. "bs4" is the original parser.
+    EXTRACTOR = "lxml"
+    # Set PARTIAL to True to stop downloading each detail page once every field
+    # has been seen, skipping the description, related listings and footer.
+    PARTIAL = False
+    # Set LINK_STORE to a path prefix (e.g. "src/links") to keep the link history
+    # in a memory-mapped store instead of LINK_INDEX; it stays fast and small
+    # with millions of links, and also flags links that failed to scrape.
+    LINK_STORE = None
+    # Set BUDGET_SECONDS and/or BUDGET_REQUESTS (detail pages) to cap a run; the
+    # most valuable pages are then scraped first: never-scraped listings, then
+    # price changes, then (with REFRESH_DAYS) the stalest records. Set
+    # REFRESH_DAYS to also re-scrape unchanged listings whose record is older.
+    BUDGET_SECONDS = None
+    BUDGET_REQUESTS = None
+    REFRESH_DAYS = None
+    # Set PROFILE_FILE (e.g. "src/extract_profile.folded") to time every field
+    # extractor and DOM operation; a ranked report is printed at the end and
+    # the stacks are written for flamegraph.pl or speedscope.
+    PROFILE_FILE = None
+    # Set PROCESS_PARSE to True to parse detail pages in a pool of processes
+    # while the requests only download, so parsing is not limited to one core
+    # by the GIL. PARSE_PROCESSES sets the pool size; None means one process
+    # per core with the threads engine and 4 with the async one.
+    PROCESS_PARSE = False
+    PARSE_PROCESSES = None
+    main(test_limit=TEST_LIMIT, sharded=SHARDED, streaming=STREAMING, engine=ENGINE,
+         page_cache=PAGE_CACHE, link_index=LINK_INDEX, checkpoint_dir=CHECKPOINT_DIR,
+         adaptive=ADAPTIVE, metrics_file=METRICS_FILE, light=LIGHT,
+         extractor=EXTRACTOR, partial=PARTIAL, link_store=LINK_STORE,
+         budget_seconds=BUDGET_SECONDS, budget_requests=BUDGET_REQUESTS,
+         refresh_days=REFRESH_DAYS, profile_file=PROFILE_FILE,
+         process_parse=PROCESS_PARSE, parse_processes=PARSE_PROCESSES)
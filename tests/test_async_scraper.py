@@ -0,0 +1,20 @@
+import httpx
+import pandas as pd
+
+from lib.async_scraper import AsyncDetailScraper
+
+LINKS = {f"https://immovlan.be/en/detail/villa/for-sale/1000/brussels/vwd{i}" for i in range(5)}
+
+
+class MockScraper(AsyncDetailScraper):
+    def _make_client(self):
+        page = '<span class="detail__header_price_data">350 000 €</span>'
+        return httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, text=page)
+        ))
+
+
+def test_links_can_be_a_set(tmp_path):
+    output = tmp_path / "details.csv"
+    MockScraper(http2=False).scrape_and_store(LINKS, str(output))
+    assert set(pd.read_csv(output)["Link"]) == LINKS
@@ -0,0 +1,63 @@
+from lib.distributed import BAND, DETAIL, Coordinator, put_links
+from lib.work_queue import WorkQueue
+
+
+class FakeCollector:
+    def __init__(self):
+        self.planned = 0
+
+    def probe_density(self):
+        return []
+
+    def plan_price_bands(self, samples, max_pages=50):
+        self.planned += 1
+        return [(0, 100000), (100001, None)]
+
+
+def finish_all(queue):
+    for kind in (BAND, DETAIL):
+        items = queue.lease("w", kind, 100)
+        queue.ack("w", [(item.id, None) for item in items])
+
+
+def test_unfinished_queue_is_resumed(tmp_path):
+    queue = WorkQueue(str(tmp_path / "q.sqlite"))
+    collector = FakeCollector()
+    Coordinator(queue, collector).seed()
+    queue.lease("w", BAND, 1)
+
+    Coordinator(queue, collector).seed()
+    assert collector.planned == 1
+    assert queue.counts()[BAND] == {WorkQueue.LEASED: 1, WorkQueue.PENDING: 1}
+
+
+def test_finished_queue_starts_a_new_round(tmp_path):
+    queue = WorkQueue(str(tmp_path / "q.sqlite"))
+    collector = FakeCollector()
+    Coordinator(queue, collector).seed()
+    put_links(queue, ["https://immovlan.be/en/detail/villa/for-sale/4040/herstal/vbb80010"])
+    finish_all(queue)
+
+    Coordinator(queue, collector).seed()
+    assert collector.planned == 2
+    assert queue.counts() == {BAND: {WorkQueue.PENDING: 2}}
+
+
+def test_fresh_discards_unfinished_work(tmp_path):
+    queue = WorkQueue(str(tmp_path / "q.sqlite"))
+    collector = FakeCollector()
+    Coordinator(queue, collector).seed()
+    Coordinator(queue, collector).seed(fresh=True)
+    assert collector.planned == 2
+    assert queue.counts() == {BAND: {WorkQueue.PENDING: 2}}
+
+
+def test_detail_links_are_queued_once_per_listing(tmp_path):
+    queue = WorkQueue(str(tmp_path / "q.sqlite"))
+    added = put_links(queue, [
+        "https://immovlan.be/en/detail/villa/for-sale/4040/herstal/vbb80010",
+        "https://immovlan.be/en/detail/villa/for-sale/4041/vottem/VBB80010/",
+        "https://immovlan.be/en/detail/villa/for-sale/4040/herstal/vbb80011",
+    ])
+    assert added == 2
+    assert put_links(queue, ["https://immovlan.be/en/detail/house/for-sale/4040/herstal/vbb80011"]) == 0
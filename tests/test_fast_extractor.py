@@ -0,0 +1,13 @@
+import pytest
+
+from lib.detail_scraper import DetailScraper
+
+LINK = "https://immovlan.be/en/detail/villa/for-sale/1000/brussels/vwd1234"
+
+
+@pytest.mark.parametrize("body", [b"", b"  \n", b"<!-- maintenance -->"])
+def test_empty_page_gives_the_same_record_as_bs4(body):
+    record = DetailScraper.parse_detail_lxml(body, LINK, "utf-8")
+    assert record == DetailScraper.parse_detail(body, LINK, "utf-8")
+    assert record["Price"] == "N/A"
+    assert record["State of the property"] == "N/A"
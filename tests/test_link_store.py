@@ -0,0 +1,52 @@
+import struct
+
+from lib.link_store import LinkStore
+
+LINK = "https://immovlan.be/en/detail/villa/for-sale/4040/herstal/vbb80010"
+
+
+def test_oversized_price_counts_as_no_price(tmp_path):
+    store = LinkStore(str(tmp_path / "links"))
+    store.begin_run()
+    # Digits of a price range joined together, beyond int32
+    assert store.observe(LINK, 12500002000000) == "new"
+    assert list(store.entries())[0][2] == 12500002000000
+    # Beyond int64
+    assert store.observe(LINK, 10 ** 30) == "new"
+    assert list(store.entries())[0][2] is None
+    store.close()
+
+
+def test_price_change_is_detected_above_int32(tmp_path):
+    store = LinkStore(str(tmp_path / "links"))
+    store.begin_run()
+    store.observe(LINK, 3000000000)
+    store.mark_scraped({"Link": LINK})
+    store.begin_run()
+    assert store.observe(LINK, 3000000000) == "unchanged"
+    assert store.observe(LINK, 3000000001) == "changed"
+    store.close()
+
+
+def test_version_1_index_is_upgraded(tmp_path):
+    path = str(tmp_path / "links")
+    store = LinkStore(path)
+    store.begin_run()
+    store.observe(LINK, 250000)
+    store.mark_scraped({"Link": LINK})
+    slots = [store._read(i) for i in range(store.capacity)]
+    capacity, count, run = store.capacity, store.count, store.run
+    store.close()
+
+    # Rewrite the index in the version 1 layout
+    with open(path + ".idx", "wb") as f:
+        f.write(LinkStore.HEADER.pack(LinkStore.MAGIC, 1, capacity, count, run)
+                .ljust(LinkStore.HEADER_SIZE, b"\0"))
+        for slot in slots:
+            f.write(LinkStore.SLOT_V1.pack(*slot))
+
+    store = LinkStore(path)
+    assert struct.unpack_from("<I", store.index, 4)[0] == LinkStore.VERSION
+    store.begin_run()
+    assert store.observe(LINK, 250000) == "unchanged"
+    store.close()
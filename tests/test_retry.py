@@ -0,0 +1,31 @@
+import pytest
+import requests
+
+from lib.retry import FetchError, RetryPolicy, call_with_retry
+
+POLICIES = {name: RetryPolicy(3) for name in ("throttled", "server", "network", "gone", "client")}
+
+
+def test_transport_errors_are_retried():
+    calls = []
+
+    def get():
+        calls.append(1)
+        raise requests.ConnectionError("reset")
+
+    with pytest.raises(FetchError) as error:
+        call_with_retry(get, "https://example.com", POLICIES)
+    assert error.value.error_class == "network"
+    assert len(calls) == 3
+
+
+def test_programming_errors_propagate():
+    calls = []
+
+    def get():
+        calls.append(1)
+        raise KeyError("price")
+
+    with pytest.raises(KeyError):
+        call_with_retry(get, "https://example.com", POLICIES)
+    assert len(calls) == 1
@@ -0,0 +1,54 @@
+import json
+
+from lib.detail_scraper import DetailScraper
+from lib.structured_data import extract_structured, find_blobs
+
+LINK = "https://immovlan.be/en/detail/villa/for-sale/1000/brussels/vwd1234"
+
+
+def listing_blob(**overrides):
+    blob = {
+        "@type": "Residence", "url": LINK, "address": {"postalCode": "1000"},
+        "offers": {"price": 350000}, "numberOfBedrooms": 3, "floorSize": {"value": 150},
+        "kitchen_equipment": "Yes", "furnished": False, "fireplace": None, "terrace": None,
+        "terrace_surface": None, "garden": True, "land_surface": 500, "facades": None,
+        "swimming_pool": None, "condition": "Excellent",
+    }
+    blob.update(overrides)
+    return blob
+
+
+def page(*blobs):
+    scripts = "".join(
+        f'<script type="application/ld+json">{json.dumps(blob)}</script>' for blob in blobs
+    )
+    return f"<html><head>{scripts}</head><body></body></html>"
+
+
+def test_decoy_blob_is_ignored():
+    # A related-listings widget that comes first and shares every key name
+    decoy = listing_blob(url="https://immovlan.be/en/detail/house/for-sale/1000/brussels/vwd9999",
+                         offers={"price": 1}, condition="To renovate")
+    texts, reason = extract_structured(page(decoy, listing_blob()), LINK)
+    assert reason is None
+    assert texts["price"] == "350000"
+    assert texts["state"] == "Excellent"
+
+
+def test_page_with_only_a_decoy_has_no_blob():
+    decoy = listing_blob(url="https://immovlan.be/en/detail/house/for-sale/1000/brussels/vwd9999")
+    assert extract_structured(page(decoy), LINK) == (None, "no_blob")
+
+
+def test_unclosed_script_tag_stops_the_scan():
+    body = '<script type="application/ld+json"'
+    assert list(find_blobs(body)) == []
+    assert list(find_blobs(body.encode())) == []
+
+
+def test_empty_page_falls_back_without_crashing():
+    for body in (b"", b"  \n", b"<!-- maintenance -->"):
+        timings = {}
+        record = DetailScraper.parse_detail_json(body, LINK, "utf-8", timings=timings)
+        assert timings["path"] == "no_blob"
+        assert record == DetailScraper.parse_detail(body, LINK, "utf-8")